@@ -13,7 +13,12 @@ class APIConfig(AppConfig):
     verbose_name = "API"
 
     def ready(self):
-        # Configure Elasticsearch connections for connection pooling.
+        from kuma.api.v1.search.hedging import node_alias
+
+        # Configure Elasticsearch connections for connection pooling. Plus
+        # one to each node, to hedge searches with. See
+        # `kuma.api.v1.search.hedging`.
         connections.configure(
             default={"hosts": settings.ES_URLS},
+            **{node_alias(host): {"hosts": [host]} for host in settings.ES_URLS},
         )
@@ -0,0 +1,209 @@
+import argparse
+import itertools
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from elasticsearch import Elasticsearch, Transport
+from elasticsearch_dsl.connections import connections
+
+from kuma.core.urlresolvers import reverse
+
+SORTS = ("best", "relevance", "popularity")
+SIZES = (10, 50, 100)
+
+# A mix of single words, phrases and typos, so that every part of the search
+# gets exercised. Including the suggestions, and verifying them.
+QUERIES = (
+    "flex",
+    "grid",
+    "fetch api",
+    "array prototype map",
+    "flexbx",
+    "border radius",
+    "promise all",
+    "position sticky",
+)
+
+WORDS = (
+    "the element property method returns value array object function string "
+    "which specifies used create new interface web browser style layout grid "
+    "flex container items align justify content border radius color event"
+).split()
+
+
+def make_recording(hits=100, seed=0):
+    """Return a recorded `_search` response, of a realistic size: `hits` hits,
+    each with highlights, and term suggestions."""
+    rnd = random.Random(seed)
+
+    def sentence(words):
+        return " ".join(rnd.choice(WORDS) for _ in range(words)).capitalize()
+
+    def fragment():
+        words = [rnd.choice(WORDS) for _ in range(20)]
+        words[rnd.randrange(len(words))] = "<mark>flex</mark>"
+        return " ".join(words)
+
+    documents = []
+    for i in range(hits):
+        slug = "Web/" + "/".join(sentence(1) for _ in range(rnd.randint(1, 4)))
+        popularity = rnd.random() / (i + 1)
+        score = 50.0 / (i + 1)
+        documents.append(
+            {
+                "_index": "mdn_docs_20220301",
+                "_type": "_doc",
+                "_id": f"/en-us/docs/{slug}{i}",
+                "_score": score,
+                "_source": {
+                    "title": sentence(rnd.randint(1, 6)),
+                    "summary": sentence(rnd.randint(15, 40)) + ".",
+                    "locale": "en-us",
+                    "slug": f"{slug}{i}",
+                    "popularity": popularity,
+                },
+                "highlight": {
+                    "title": [fragment()],
+                    "body": [fragment() for _ in range(3)],
+                },
+                "sort": [score, popularity, f"/en-us/docs/{slug}{i}"],
+            }
+        )
+    options = [
+        {"text": "flex", "score": 0.75, "freq": 2700},
+        {"text": "flux", "score": 0.5, "freq": 12},
+    ]
+    return {
+        "took": 12,
+        "timed_out": False,
+        "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+        "hits": {
+            "total": {"value": 10000, "relation": "gte"},
+            "max_score": documents[0]["_score"] if documents else None,
+            "hits": documents,
+        },
+        "suggest": {
+            name: [{"text": "flexbx", "offset": 0, "length": 6, "options": options}]
+            for name in ("title_suggestions", "body_suggestions")
+        },
+    }
+
+
+class ReplayTransport(Transport):
+    """Stands in for Elasticsearch by replaying the `recording`, sliced to
+    the requested size, rather than sending anything anywhere."""
+
+    recording = None
+
+    def perform_request(self, method, url, headers=None, params=None, body=None):
+        if url.endswith("/_alias"):
+            index = url.strip("/").split("/")[0]
+            return {"mdn_docs_20220301": {"aliases": {index: {}}}}
+        if url.endswith("/_msearch"):
+            searches = len([x for x in body.splitlines() if x.strip()]) // 2
+            return {
+                "took": 3,
+                "responses": [self._response(0) for _ in range(searches)],
+            }
+        size = body.get("size", 10)
+        response = self._response(size)
+        if "suggest" not in body:
+            del response["suggest"]
+        return response
+
+    def _response(self, size):
+        hits = self.recording["hits"]
+        return {
+            **self.recording,
+            "hits": {**hits, "hits": hits["hits"][:size]},
+        }
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive number")
+    return number
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks /api/v1/search, through the Django test client, against "
+        "a stand-in for Elasticsearch that replays a recorded response"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--number",
+            type=positive_int,
+            default=200,
+            help="Number of searches per sort and page size",
+        )
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument(
+            "--recording",
+            type=open,
+            help=(
+                "JSON file of a recorded `_search` response (with as many hits "
+                "as the biggest page size), instead of a generated one"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["recording"]:
+            recording = json.load(options["recording"])
+        else:
+            recording = make_recording(hits=max(SIZES))
+
+        elasticsearch = Elasticsearch(
+            hosts=["replay:9200"], transport_class=ReplayTransport
+        )
+        elasticsearch.transport.recording = recording
+        connections.add_connection("default", elasticsearch)
+
+        with override_settings(
+            ALLOWED_HOSTS=["testserver"],
+            # Every search has to actually be made, every time.
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+            },
+            SEARCH_RESULTS_CACHE_TIMEOUT=0,
+            SEARCH_COALESCE_TIMEOUT=0,
+            SEARCH_DEGRADATION_THRESHOLDS=[],
+            SEARCH_CANONICAL_REDIRECTS=False,
+        ):
+            self.benchmark(options["number"], options["warmup"])
+
+    def benchmark(self, number, warmup):
+        client = Client()
+        url = reverse("api.v1.search")
+        self.stdout.write(
+            f"{'sort':<12}{'size':>6}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}"
+        )
+        for sort, size in itertools.product(SORTS, SIZES):
+            queries = itertools.cycle(QUERIES)
+            timings = []
+            for i in range(warmup + number):
+                params = {"q": next(queries), "sort": sort, "size": size}
+                start = time.perf_counter()
+                response = client.get(url, params)
+                took = time.perf_counter() - start
+                assert response.status_code == 200, response.content
+                if i >= warmup:
+                    timings.append(took * 1000)
+            if len(timings) > 1:
+                percentiles = statistics.quantiles(timings, n=100)
+            else:
+                # It takes at least two to work out percentiles. Of one,
+                # every percentile is that one.
+                percentiles = timings * 99
+            self.stdout.write(
+                f"{sort:<12}{size:>6}{number / (sum(timings) / 1000):>10.1f}"
+                f"{percentiles[49]:>8.2f}ms{percentiles[94]:>8.2f}ms"
+                f"{percentiles[98]:>8.2f}ms"
+            )
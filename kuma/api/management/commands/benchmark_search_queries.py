@@ -0,0 +1,44 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from kuma.api.v1.search import _page_search
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares how long it takes to build search request bodies, with "
+        "elasticsearch_dsl versus from the precompiled bodies"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("-n", "--number", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        number = options["number"]
+        self.stdout.write(f"{'sort':<12}{'query':<10}{'dsl':>12}{'compiled':>12}")
+        for sort in ("best", "relevance", "popularity"):
+            for query_string in ("flex", "flex box"):
+                params = {
+                    "query": query_string,
+                    "locales": ["en-us"],
+                    "slug_prefixes": [],
+                    "size": 10,
+                    "page": 1,
+                    "sort": sort,
+                    "cursor": None,
+                }
+                timings = []
+                for compiled in (False, True):
+                    with override_settings(SEARCH_COMPILED_QUERIES=compiled):
+                        seconds = timeit.timeit(
+                            lambda: _page_search(params, True).to_dict(),
+                            number=number,
+                        )
+                    timings.append(seconds / number * 1_000_000)
+                phrase = "phrase" if " " in query_string else "word"
+                self.stdout.write(
+                    f"{sort:<12}{phrase:<10}"
+                    f"{timings[0]:>10.1f}us{timings[1]:>10.1f}us"
+                )
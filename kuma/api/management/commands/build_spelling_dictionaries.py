@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from kuma.api.tasks import build_spelling_dictionaries
+
+
+class Command(BaseCommand):
+    help = "Builds the spelling dictionaries, for search, from the current index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Even if they've already been built for the current index",
+        )
+        parser.add_argument(
+            "--async",
+            action="store_true",
+            dest="run_async",
+            help="Leave it to a Celery worker",
+        )
+
+    def handle(self, *args, **options):
+        if options["run_async"]:
+            build_spelling_dictionaries.delay(force=options["force"])
+            return
+        locales = build_spelling_dictionaries(force=options["force"])
+        if locales:
+            self.stdout.write(f"Built for: {', '.join(locales)}")
+        else:
+            self.stdout.write("Already built for the current index")
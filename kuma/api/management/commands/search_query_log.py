@@ -0,0 +1,50 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from kuma.api.v1.search import querylog
+
+
+class Command(BaseCommand):
+    help = "Summarizes the logged searches: the most frequent, and the slowest"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n", "--top", type=int, default=20, help="How many of each to list"
+        )
+        parser.add_argument(
+            "--file",
+            help=(
+                "JSON lines file of logged searches, instead of "
+                "SEARCH_QUERY_LOG_FILE (or the Redis stream)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        top = options["top"]
+        entries = querylog.read(options["file"])
+        self.stdout.write(f"{len(entries)} searches logged")
+        if not entries:
+            return
+
+        by_query = defaultdict(list)
+        for entry in entries:
+            by_query[entry["query"]].append(entry)
+        self.stdout.write("\nMost frequent:")
+        self.stdout.write(f"{'count':>8}{'hits':>8}{'avg took':>10}  query")
+        most_frequent = sorted(by_query.items(), key=lambda x: (-len(x[1]), x[0]))
+        for query, logged in most_frequent[:top]:
+            hits = sum(1 for x in logged if x["cache"] in ("hit", "coalesced"))
+            average = sum(x["took_ms"] for x in logged) / len(logged)
+            self.stdout.write(f"{len(logged):>8}{hits:>8}{average:>8.0f}ms  {query}")
+
+        # Cached results carry how long it took to find them the first time.
+        # Only count that once.
+        searched = [x for x in entries if x["cache"] not in ("hit", "coalesced")]
+        self.stdout.write("\nSlowest:")
+        self.stdout.write(f"{'took':>8}{'total':>8}  {'sort':<12}{'locales':<16}query")
+        for entry in sorted(searched, key=lambda x: -x["took_ms"])[:top]:
+            self.stdout.write(
+                f"{entry['took_ms']:>6}ms{entry['total']:>8}  {entry['sort']:<12}"
+                f"{','.join(entry['locales']):<16}{entry['query']}"
+            )
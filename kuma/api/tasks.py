@@ -0,0 +1,10 @@
+from celery import task
+
+from kuma.api.v1.search import spelling
+
+
+@task
+def build_spelling_dictionaries(force=False):
+    """Build the spelling dictionaries for the current search index, unless
+    that's already been done."""
+    return spelling.build_dictionaries(force=force)
@@ -1,7 +1,12 @@
+import datetime
 import json
 
 from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from model_bakery import baker
 
 from kuma.notifications import models
@@ -44,3 +49,269 @@ def test_admin_update_content(user_client, wiki_user):
     assert notification["title"] == page_title
     assert notification["url"] == page_url
     assert notification["text"] == "Page updated (see PR!mdn/content!14607!!)"
+
+
+def test_admin_create_notifies_every_watcher(
+    user_client, wiki_user, django_assert_max_num_queries
+):
+    # Prepare: The same page, watched twice, by lots of users.
+    page_url = "/en-us/docs/web/html/element/dialog"
+    users = baker.make(User, _quantity=30)
+    baker.make(models.Watch, users=users[:20], url=page_url)
+    baker.make(models.Watch, users=users[20:] + [wiki_user], url=page_url)
+
+    # Test: Create a notification for all of them.
+    url = reverse("admin_api:admin.create")
+    auth_headers = {
+        "HTTP_AUTHORIZATION": f"Bearer {settings.NOTIFICATIONS_ADMIN_TOKEN}",
+    }
+    # Every one of them would need an INSERT of their own, one at a time.
+    with django_assert_max_num_queries(10):
+        response = user_client.post(
+            url,
+            json.dumps(
+                {
+                    "page": "/en-US/docs/Web/HTML/Element/dialog",
+                    "title": "<dialog>",
+                    "text": "Page updated",
+                }
+            ),
+            content_type="application/json",
+            **auth_headers,
+        )
+    assert response.status_code == 200
+
+    # Verify: Everyone got the notification.
+    notified = models.Notification.objects.values_list("user_id", flat=True)
+    assert sorted(notified) == sorted(user.id for user in users + [wiki_user])
+
+
+def test_admin_update_looks_up_watchers_at_once(user_client, wiki_user, mock_requests):
+    # Prepare: Watch a feature, and a subfeature of another feature.
+    baker.make(models.Watch, users=[wiki_user], path="api.Foo", url="/foo")
+    baker.make(models.Watch, users=[wiki_user], path="api.Bar.baz", url="/bar")
+    changes = [
+        {
+            "event": "added_subfeatures",
+            "path": path,
+            "subfeatures": ["one"],
+        }
+        for path in (
+            "api.Foo.a.b.c",
+            "api.Foo.d",
+            "api.Bar.baz.e.f",
+            "api.Bar.qux",
+            "css.properties.nope.g.h",
+        )
+    ]
+    mock_requests.get(settings.NOTIFICATIONS_CHANGES_URL + "changes.json", json=changes)
+
+    # Test: Process the changes.
+    url = reverse("admin_api:admin.update")
+    auth_headers = {
+        "HTTP_AUTHORIZATION": f"Bearer {settings.NOTIFICATIONS_ADMIN_TOKEN}",
+    }
+    with CaptureQueriesContext(connection) as queries:
+        response = user_client.post(
+            url,
+            json.dumps({"filename": "changes.json"}),
+            content_type="application/json",
+            **auth_headers,
+        )
+    assert response.status_code == 202
+
+    # Verify: Who's watching what was looked up once, not level by level.
+    watch_lookups = [
+        x for x in queries.captured_queries if 'FROM "notifications_watch"' in x["sql"]
+    ]
+    assert len(watch_lookups) == 1
+    notified = models.Notification.objects.order_by("notification__title")
+    assert [x.notification.title for x in notified] == [
+        "Foo.a.b.c",
+        "Foo.d",
+        "baz.e.f",
+    ]
+
+
+def test_admin_update_in_chunks(user_client, wiki_user, mock_requests, settings):
+    # Prepare: A changes file with more events than fit in one chunk.
+    settings.NOTIFICATIONS_INGEST_CHUNK_SIZE = 2
+    baker.make(models.Watch, users=[wiki_user], path="api.Foo", url="/foo")
+    changes = [
+        {"event": "added_subfeatures", "path": f"api.Foo.{i}", "subfeatures": ["x"]}
+        for i in range(5)
+    ]
+    # One that can't be processed.
+    changes[3]["path"] = None
+    mock_requests.get(settings.NOTIFICATIONS_CHANGES_URL + "changes.json", json=changes)
+    auth_headers = {
+        "HTTP_AUTHORIZATION": f"Bearer {settings.NOTIFICATIONS_ADMIN_TOKEN}",
+    }
+
+    # Test: Process the changes, which Celery does straight away in tests.
+    response = user_client.post(
+        reverse("admin_api:admin.update"),
+        json.dumps({"filename": "changes.json"}),
+        content_type="application/json",
+        **auth_headers,
+    )
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    # Verify: Every chunk was processed, and the one that failed is reported.
+    url = reverse("admin_api:admin.update_status", kwargs={"job_id": job_id})
+    response = user_client.get(url, **auth_headers)
+    assert response.status_code == 200
+    job = response.json()
+    assert job["filename"] == "changes.json"
+    assert job["status"] == "failed"
+    assert job["events"] == 5
+    assert job["chunks"] == 3
+    assert job["chunks_done"] == 3
+    (error,) = job["errors"]
+    assert error.startswith("Error while processing chunk 1")
+    # Only the chunk that failed is missing.
+    assert models.Notification.objects.count() == 3
+
+    url = reverse("admin_api:admin.update_status", kwargs={"job_id": job_id + 1})
+    response = user_client.get(url, **auth_headers)
+    assert response.status_code == 404
+
+
+def test_admin_update_truncated_file(user_client, wiki_user, mock_requests, settings):
+    # Prepare: A changes file that was cut short.
+    settings.NOTIFICATIONS_INGEST_CHUNK_SIZE = 2
+    baker.make(models.Watch, users=[wiki_user], path="api.Foo", url="/foo")
+    changes = [
+        {"event": "added_subfeatures", "path": f"api.Foo.{i}", "subfeatures": ["x"]}
+        for i in range(5)
+    ]
+    mock_requests.get(
+        settings.NOTIFICATIONS_CHANGES_URL + "changes.json",
+        text=json.dumps(changes)[:-20],
+    )
+    auth_headers = {
+        "HTTP_AUTHORIZATION": f"Bearer {settings.NOTIFICATIONS_ADMIN_TOKEN}",
+    }
+
+    # Test: Process what there is of it.
+    response = user_client.post(
+        reverse("admin_api:admin.update"),
+        json.dumps({"filename": "changes.json"}),
+        content_type="application/json",
+        **auth_headers,
+    )
+    assert response.status_code == 202
+
+    # Verify: The chunks that were read in full were processed nonetheless.
+    job = response.json()
+    assert job["status"] == "failed"
+    assert job["events"] == 4
+    assert job["chunks"] == job["chunks_done"] == 2
+    (error,) = job["errors"]
+    assert error.startswith("Error while reading file")
+    assert models.Notification.objects.count() == 4
+
+
+def test_admin_update_idempotent(user_client, wiki_user, mock_requests, settings):
+    # Prepare: Two changes files, that overlap.
+    baker.make(models.Watch, users=[wiki_user], path="api.Foo", url="/foo")
+    changes = [
+        {"event": "added_subfeatures", "path": f"api.Foo.{i}", "subfeatures": ["x"]}
+        for i in range(4)
+    ]
+    mock_requests.get(
+        settings.NOTIFICATIONS_CHANGES_URL + "first.json", json=changes[:3]
+    )
+    mock_requests.get(
+        settings.NOTIFICATIONS_CHANGES_URL + "second.json", json=changes[1:]
+    )
+    url = reverse("admin_api:admin.update")
+    auth_headers = {
+        "HTTP_AUTHORIZATION": f"Bearer {settings.NOTIFICATIONS_ADMIN_TOKEN}",
+    }
+
+    def update(filename):
+        return user_client.post(
+            url,
+            json.dumps({"filename": filename}),
+            content_type="application/json",
+            **auth_headers,
+        )
+
+    # Test: Process the first file, then again, as if the webhook was retried.
+    response = update("first.json")
+    assert response.status_code == 202
+    first = response.json()
+    assert first["status"] == "done"
+    assert len(first["content_hash"]) == 64
+    assert models.Notification.objects.count() == 3
+
+    response = update("first.json")
+    assert response.status_code == 202
+    again = response.json()
+    assert again["id"] != first["id"]
+    assert again["status"] == "done"
+    assert again["content_hash"] == first["content_hash"]
+    assert again["events"] == 3
+    assert models.Notification.objects.count() == 3
+
+    # Verify: Of the second file, only what's new is published.
+    response = update("second.json")
+    assert response.status_code == 202
+    assert response.json()["status"] == "done"
+    assert models.Notification.objects.count() == 4
+
+    # Verify: A file that changed, since it was processed, is processed again.
+    changes.append(
+        {"event": "added_subfeatures", "path": "api.Foo.4", "subfeatures": ["x"]}
+    )
+    mock_requests.get(
+        settings.NOTIFICATIONS_CHANGES_URL + "first.json",
+        json=changes[:1] + changes[4:],
+    )
+    response = update("first.json")
+    assert response.status_code == 202
+    assert response.json()["status"] == "done"
+    assert response.json()["content_hash"] != first["content_hash"]
+    assert models.Notification.objects.count() == 5
+
+
+def test_admin_update_stale_job(user_client, wiki_user, mock_requests, settings):
+    # Prepare: A job for the file that got stuck, an hour ago.
+    settings.NOTIFICATIONS_INGEST_STALE_AFTER = 60 * 60
+    stuck = baker.make(
+        models.ChangesIngestJob,
+        filename="changes.json",
+        status=models.ChangesIngestJob.Status.RUNNING,
+    )
+    mock_requests.get(settings.NOTIFICATIONS_CHANGES_URL + "changes.json", json=[])
+    auth_headers = {
+        "HTTP_AUTHORIZATION": f"Bearer {settings.NOTIFICATIONS_ADMIN_TOKEN}",
+    }
+
+    def update():
+        return user_client.post(
+            reverse("admin_api:admin.update"),
+            json.dumps({"filename": "changes.json"}),
+            content_type="application/json",
+            **auth_headers,
+        )
+
+    # Test: While it might still be making progress, it's waited for.
+    response = update()
+    assert response.status_code == 200
+    assert response.json()["id"] == stuck.id
+
+    # Test: Not any longer.
+    models.ChangesIngestJob.objects.filter(id=stuck.id).update(
+        modified=timezone.now() - datetime.timedelta(seconds=60 * 60 + 1)
+    )
+    response = update()
+    assert response.status_code == 202
+    assert response.json()["id"] != stuck.id
+    assert response.json()["status"] == "done"
+    stuck.refresh_from_db()
+    assert stuck.status == models.ChangesIngestJob.Status.FAILED
+    (error,) = stuck.errors
+    assert error.startswith("No progress since")
@@ -0,0 +1,37 @@
+from io import StringIO
+
+from django.core.management import call_command
+from elasticsearch_dsl.connections import connections
+
+
+def test_benchmark_search():
+    stdout = StringIO()
+    try:
+        call_command("benchmark_search", number=2, warmup=1, stdout=stdout)
+    finally:
+        connections.remove_connection("default")
+    lines = stdout.getvalue().splitlines()
+    assert lines[0].split() == ["sort", "size", "req/s", "p50", "p95", "p99"]
+    # Every sort, with every page size.
+    assert len(lines) == 1 + 3 * 3
+
+
+def test_benchmark_search_single():
+    stdout = StringIO()
+    try:
+        call_command("benchmark_search", "-n", "1", "--warmup", "0", stdout=stdout)
+    finally:
+        connections.remove_connection("default")
+    lines = stdout.getvalue().splitlines()
+    assert len(lines) == 1 + 3 * 3
+    # With a single search, p50, p95 and p99 are all how long it took.
+    sort, size, rate, p50, p95, p99 = lines[1].split()
+    assert p50 == p95 == p99
+
+
+def test_benchmark_search_queries():
+    stdout = StringIO()
+    call_command("benchmark_search_queries", number=1, stdout=stdout)
+    lines = stdout.getvalue().splitlines()
+    assert lines[0].split() == ["sort", "query", "dsl", "compiled"]
+    assert len(lines) == 1 + 3 * 2
@@ -4,6 +4,7 @@ from ninja import NinjaAPI
 from ratelimit.exceptions import Ratelimited
 
 from .auth import admin_auth, profile_auth
+from .renderers import FastJSONRenderer
 
 
 class NoCacheNinjaAPI(NinjaAPI):
@@ -13,10 +14,16 @@ class NoCacheNinjaAPI(NinjaAPI):
         return response
 
 
-api = NoCacheNinjaAPI(auth=profile_auth, csrf=True, version="v1")
+api = NoCacheNinjaAPI(
+    auth=profile_auth, csrf=True, version="v1", renderer=FastJSONRenderer()
+)
 
 admin_api = NoCacheNinjaAPI(
-    auth=admin_auth, csrf=False, version="v1", urls_namespace="admin_api"
+    auth=admin_auth,
+    csrf=False,
+    version="v1",
+    urls_namespace="admin_api",
+    renderer=FastJSONRenderer(),
 )
 
 
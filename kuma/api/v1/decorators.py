@@ -1,3 +1,4 @@
+import asyncio
 from functools import wraps
 
 from django.http import HttpResponseForbidden
@@ -8,6 +9,17 @@ from .auth import NotASubscriber, is_subscriber
 def allow_CORS_GET(func):
     """Decorator to allow CORS for GET requests"""
 
+    if asyncio.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_inner(request, *args, **kwargs):
+            response = await func(request, *args, **kwargs)
+            if "GET" == request.method:
+                response["Access-Control-Allow-Origin"] = "*"
+            return response
+
+        return async_inner
+
     @wraps(func)
     def inner(request, *args, **kwargs):
         response = func(request, *args, **kwargs)
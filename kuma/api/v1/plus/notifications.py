@@ -1,27 +1,28 @@
 from __future__ import annotations
 
 import datetime
-import json
-from typing import Optional
+from typing import List, Optional
 
-# import requests
-import requests
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from django.middleware.csrf import get_token
+from django.utils import timezone
 from ninja import Field, Router
 from ninja.pagination import paginate
 from sentry_sdk import capture_exception
 
 from kuma.documenturls.models import DocumentURL
 from kuma.notifications.models import (
+    ChangesIngestJob,
     DefaultWatch,
     Notification,
     NotificationData,
     UserWatch,
     Watch,
 )
-from kuma.notifications.utils import process_changes
+from kuma.notifications.tasks import ingest_changes
+from kuma.notifications.utils import notify_watchers, process_changes
 from kuma.settings.common import MAX_NON_SUBSCRIBED
 from kuma.users.models import UserProfile
 
@@ -359,7 +360,7 @@ class CreateNotificationSchema(Schema):
     text: str
 
 
-@admin_router.post("/create/", response={200: Ok, 400: NotOk})
+@admin_router.post("/create/", response={200: Ok, 400: NotOk}, url_name="admin.create")
 def create(request, body: CreateNotificationSchema):
     url = DocumentURL.normalize_uri(body.raw_url)
     watchers = Watch.objects.filter(url=url)
@@ -369,10 +370,8 @@ def create(request, body: CreateNotificationSchema):
         text=body.text, title=body.title, type="content"
     )
 
-    for watcher in watchers:
-        # considering the possibility of multiple pages existing for the same path
-        for user in watcher.users.all():
-            Notification.objects.create(notification=notification_data, user=user)
+    # considering the possibility of multiple pages existing for the same path
+    notify_watchers(notification_data, watchers)
 
     return True
 
@@ -381,23 +380,77 @@ class UpdateNotificationSchema(Schema):
     filename: str
 
 
-@admin_router.post("/update/", response={200: Ok, 400: NotOk, 401: NotOk})
+class ChangesIngestJobSchema(Schema):
+    id: int
+    filename: str
+    status: str
+    events: int
+    content_hash: str
+    chunks: int
+    chunks_done: int
+    errors: List[str]
+    created: datetime.datetime
+    modified: datetime.datetime
+
+
+IN_PROGRESS_STATUSES = [
+    ChangesIngestJob.Status.PENDING,
+    ChangesIngestJob.Status.DOWNLOADING,
+    ChangesIngestJob.Status.RUNNING,
+]
+
+
+@admin_router.post(
+    "/update/",
+    response={200: ChangesIngestJobSchema, 202: ChangesIngestJobSchema, 401: NotOk},
+    url_name="admin.update",
+)
 def update(request, body: UpdateNotificationSchema):
-    try:
-        changes = json.loads(
-            requests.get(settings.NOTIFICATIONS_CHANGES_URL + body.filename).content
+    # If the file is being processed, there's nothing more to do. Otherwise,
+    # it might have changed since it was last processed. If it hasn't,
+    # `ingest_changes` finds out, and skips it.
+    _give_up_on_stale_jobs(body.filename)
+    job = (
+        ChangesIngestJob.objects.filter(
+            filename=body.filename, status__in=IN_PROGRESS_STATUSES
         )
-    except Exception as e:
-        capture_exception(e)
-        return 400, {"error": f"Error while processing file: {repr(e)}"}
+        .order_by("-created")
+        .first()
+    )
+    if job:
+        return 200, job
 
-    try:
-        process_changes(changes)
-    except Exception as e:
-        capture_exception(e)
-        return 400, {"ok": False, "error": f"Error while processing file: {repr(e)}"}
+    # Big changes files take too long to process within a request. They're
+    # processed by Celery instead, see `admin.update_status` for how it goes.
+    job = ChangesIngestJob.objects.create(filename=body.filename)
+    ingest_changes.delay(job.id)
+    job.refresh_from_db()
+    return 202, job
 
-    return 200, True
+
+def _give_up_on_stale_jobs(filename):
+    stale = timezone.now() - datetime.timedelta(
+        seconds=settings.NOTIFICATIONS_INGEST_STALE_AFTER
+    )
+    with transaction.atomic():
+        for job in ChangesIngestJob.objects.select_for_update().filter(
+            filename=filename, status__in=IN_PROGRESS_STATUSES, modified__lt=stale
+        ):
+            job.status = ChangesIngestJob.Status.FAILED
+            job.errors.append(f"No progress since {job.modified.isoformat()}")
+            job.save()
+
+
+@admin_router.get(
+    "/update/{int:job_id}/",
+    response={200: ChangesIngestJobSchema, 401: NotOk, 404: NotOk},
+    url_name="admin.update_status",
+)
+def update_status(request, job_id: int):
+    job = ChangesIngestJob.objects.filter(id=job_id).first()
+    if not job:
+        return 404, {"error": "No such job"}
+    return 200, job
 
 
 class ContentUpdateNotificationSchema(Schema):
@@ -0,0 +1,42 @@
+"""
+JSON rendering for the API, with `orjson`.
+
+`orjson` is many times faster than the standard library's `json`, which
+matters for the big responses, like search results with highlights. Should
+it not be installed, everything is rendered with `json`, as before.
+
+Either way, the output is the same (as far as JSON goes) as rendering with
+Django's `DjangoJSONEncoder`. Not byte for byte, though: `orjson` writes
+non-ASCII characters as UTF-8, where `json` escapes them (`ensure_ascii`).
+The responses are `application/json`, which is UTF-8, so that's the same. In particular, datetimes are left to it, since
+`orjson` formats them slightly differently.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from ninja.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def dumps(data, encoder=DjangoJSONEncoder):
+    """Return `data` rendered as JSON, as bytes. Anything that isn't plain
+    JSON is rendered with `encoder().default`."""
+    if orjson is None:
+        return json.dumps(data, cls=encoder).encode("utf-8")
+    return orjson.dumps(
+        data,
+        default=encoder().default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Renders the responses of the Ninja APIs. Also handles the `Schema`
+    (pydantic) instances, just like `NinjaJSONEncoder` does."""
+
+    def render(self, request, data, *, response_status):
+        return dumps(data, encoder=self.encoder_class)
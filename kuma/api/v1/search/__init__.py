@@ -1,13 +1,24 @@
+import functools
+import math
+import random
+import time
+from urllib.parse import urlencode
+
 from django import http
 from django.conf import settings
-from django.utils.cache import patch_cache_control
+from django.utils.cache import get_conditional_response, patch_cache_control
 from elasticsearch import exceptions
-from elasticsearch_dsl import Q, Search, query
-from redo import retrying
+from elasticsearch_dsl import MultiSearch, Q, Search, query
 
+from kuma.api.v1 import renderers
 from kuma.api.v1.decorators import allow_CORS_GET
 
-from .forms import SearchForm
+from . import hedging, load, querylog, spelling, timing
+from .breaker import CircuitOpenError, SearchDeadlineExceeded, breaker
+from .caching import find_cached, get_index_generation, make_etag
+from .compiled import CompiledSearch, Slot, compile_body
+from .cursors import encode_cursor
+from .forms import AutocompleteForm, SearchForm
 
 # This is the number of seconds to be put into the Cache-Control max-age header
 # if the search is successful.
@@ -15,8 +26,49 @@ from .forms import SearchForm
 # the `/api/v1/search` works.
 SEARCH_CACHE_CONTROL_MAX_AGE = 60 * 60 * 12
 
-
-class JsonResponse(http.JsonResponse):
+# Results degraded under pressure (see `kuma.api.v1.search.load`) are only
+# held on to for this long. Long enough to take some pressure off, but not
+# so long that they're still served after the pressure's gone.
+DEGRADED_CACHE_CONTROL_MAX_AGE = 60
+
+# And partial results (see `_search_limits`) for even less. Another try
+# might well find everything.
+PARTIAL_CACHE_CONTROL_MAX_AGE = 10
+
+# Same thing but for `/api/v1/search/autocomplete`. The point of it is to be
+# called on every keystroke, so the CDN can be expected to see the same
+# prefixes over and over.
+AUTOCOMPLETE_CACHE_CONTROL_MAX_AGE = 60 * 60 * 12
+
+# The values of the search parameters that don't have to be in the URL.
+SEARCH_DEFAULTS = {"size": 10, "page": 1}
+
+# The term suggesters can come up with many alternative spellings (one per
+# option, per term, per suggester). This caps how many of them we bother to
+# verify, in one batch, before picking the best one.
+MAX_SUGGESTION_CANDIDATES = 10
+
+# The only fields, of the documents found, that are rendered.
+SOURCE_FIELDS = ["title", "locale", "slug", "popularity", "summary"]
+
+# The only parts of the search response that are looked at. Everything else
+# (shards, index names, types, etc.) needn't be sent over the network, let
+# alone parsed.
+FILTER_PATH = [
+    "took",
+    "timed_out",
+    "terminated_early",
+    "hits.total",
+    "hits.hits._id",
+    "hits.hits._score",
+    "hits.hits._source",
+    "hits.hits.highlight",
+    "hits.hits.sort",
+    "suggest",
+]
+
+
+class JsonResponse(http.HttpResponse):
     """The only reason this exists is so that other Django views can call
     views that return instances of this and then get to the data before it
     gets JSON serialized.
@@ -27,49 +79,148 @@ class JsonResponse(http.JsonResponse):
         response = kuma.api.v1.search.search(request)
         found = response.data
 
+    It's also rendered with `kuma.api.v1.renderers.dumps`, which is faster
+    than the standard library's `json`, when `orjson` is installed.
     """
 
-    def __init__(self, data, *args, **kwargs):
+    def __init__(self, data, **kwargs):
         self.data = data
-        super().__init__(data, *args, **kwargs)
+        kwargs.setdefault("content_type", "application/json")
+        # Search results are big, so render them as fast as possible.
+        super().__init__(content=renderers.dumps(data), **kwargs)
 
 
 @allow_CORS_GET
+@timing.server_timing
 def search(request, locale=None):
-    initial = {"size": 10, "page": 1}
+    with timing.phase("validate"):
+        params, errors = _get_params(request, locale)
+    if errors:
+        return JsonResponse({"errors": errors}, status=400)
+    redirect = _canonical_redirect(request, params, locale)
+    if redirect:
+        return redirect
+    # Everything that depends on which index is searched (the ETag, the
+    # cache keys and the spelling dictionary) agrees on this one answer.
+    generation = get_index_generation()
+    etag = make_etag(params, generation)
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+
+    # Under pressure, the first thing to go is the suggestions.
+    level = load.degradation_level()
+    try:
+        results, status = find_cached(
+            _find,
+            params,
+            generation,
+            make_suggestions=level < 1 and _should_make_suggestions(params["query"]),
+            degradation_level=level,
+        )
+    except (CircuitOpenError, SearchDeadlineExceeded) as exception:
+        return _service_unavailable(exception)
+    timing.record_cache(status)
+    querylog.log(params, results, status)
+    with timing.phase("render"):
+        return _search_response(results, etag)
+
+
+def _get_params(request, locale=None):
+    """Return the search parameters, from the request, and the form errors
+    if they're not valid."""
+    initial = dict(SEARCH_DEFAULTS)
     if locale:
         initial["locale"] = locale
     form = SearchForm(request.GET, initial=initial)
     if not form.is_valid():
-        return JsonResponse({"errors": form.errors.get_json_data()}, status=400)
+        return None, form.errors.get_json_data()
 
     locales = form.cleaned_data["locale"] or [settings.LANGUAGE_CODE]
     assert isinstance(locales, list)
 
     params = {
         "locales": [x.lower() for x in locales],
-        "query": form.cleaned_data["q"],
+        # Neither case nor whitespace change what's found.
+        "query": " ".join(form.cleaned_data["q"].lower().split()),
         "size": form.cleaned_data["size"],
         "page": form.cleaned_data["page"],
         "sort": form.cleaned_data["sort"],
         # The `slug` is always stored, as a Keyword index, in lowercase.
         "slug_prefixes": [x.lower() for x in form.cleaned_data["slug_prefix"]],
+        # The `search_after` values to continue from, if any.
+        "cursor": form.cleaned_data["cursor"] and form.cleaned_data["cursor"][1],
     }
+    return params, None
+
+
+def _canonical_redirect(request, params, locale=None):
+    """Return a redirect to the canonical URL of the search, unless that's
+    the URL already.
+
+    URLs that find the same thing are made the same, so that the CDN can
+    serve them from the same cached response. The parameters are in order,
+    the query string is normalized, and default values, and parameters that
+    don't matter, are left out.
+    """
+    if not settings.SEARCH_CANONICAL_REDIRECTS:
+        return None
+
+    canonical = [("q", params["query"])]
+    locales = sorted(set(params["locales"]))
+    if locales != [(locale or settings.LANGUAGE_CODE).lower()]:
+        canonical.extend(("locale", x) for x in locales)
+    for key in ("size", "page"):
+        if params[key] != SEARCH_DEFAULTS[key]:
+            canonical.append((key, params[key]))
+    if params["sort"] and params["sort"] != "best":
+        canonical.append(("sort", params["sort"]))
+    canonical.extend(("slug_prefix", x) for x in sorted(set(params["slug_prefixes"])))
+    if params["cursor"]:
+        canonical.append(("cursor", request.GET["cursor"]))
+
+    query_string = urlencode(sorted(canonical))
+    if query_string == request.META.get("QUERY_STRING", ""):
+        return None
+    response = http.HttpResponsePermanentRedirect(f"{request.path}?{query_string}")
+    patch_cache_control(response, public=True, max_age=SEARCH_CACHE_CONTROL_MAX_AGE)
+    return response
+
+
+def _not_modified(request, etag):
+    """Return a 304, if the client already has the results of this search,
+    from the index that's still current. Without going anywhere near
+    Elasticsearch."""
+    if not etag:
+        return None
+    response = get_conditional_response(request, etag=etag)
+    if response is None or response.status_code != 304:
+        # Such as a 412, for an `If-Match` that doesn't. That's no response
+        # to tell the CDN to hold on to. Just search, as if it wasn't there.
+        return None
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=SEARCH_CACHE_CONTROL_MAX_AGE)
+    return response
+
 
+def _should_make_suggestions(query):
     # By default, assume that we will try to make suggestions.
-    make_suggestions = True
-    if len(params["query"]) > 100 or max(len(x) for x in params["query"].split()) > 30:
+    if len(query) > 100 or max(len(x) for x in query.split()) > 30:
         # For example, if it's a really long query, or a specific word is just too
         # long, you can get those tricky
         # TransportError(500, 'search_phase_execution_exception', 'Term too complex:
         # errors which are hard to prevent against.
-        make_suggestions = False
+        return False
+    return True
 
-    results = _find(
-        params,
-        make_suggestions=make_suggestions,
-    )
+
+def _search_response(results, etag=None):
     response = JsonResponse(results)
+    # Degraded, or partial, results aren't what the client should hold on to,
+    # for as long as the index doesn't change.
+    metadata = results["metadata"]
+    if etag and not metadata.get("degradation_level") and not metadata.get("partial"):
+        response["ETag"] = etag
 
     # The reason for caching is that most of the time, the searches people make
     # are short and often stand a high chance of being reused by other users
@@ -86,25 +237,382 @@ def search(request, locale=None):
     # a repeated search. And it's an appropriate number for the CDN too.
     # For more info about how our search patterns behave,
     # see https://github.com/mdn/kuma/issues/7799
-    patch_cache_control(response, public=True, max_age=SEARCH_CACHE_CONTROL_MAX_AGE)
+    max_age = SEARCH_CACHE_CONTROL_MAX_AGE
+    if metadata.get("partial"):
+        max_age = PARTIAL_CACHE_CONTROL_MAX_AGE
+    elif metadata.get("degradation_level"):
+        max_age = DEGRADED_CACHE_CONTROL_MAX_AGE
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+@allow_CORS_GET
+def autocomplete(request):
+    form = AutocompleteForm(request.GET, initial={"size": 10})
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors.get_json_data()}, status=400)
+
+    locales = form.cleaned_data["locale"] or [settings.LANGUAGE_CODE]
+    params = {
+        "locales": [x.lower() for x in locales],
+        "query": form.cleaned_data["q"],
+        "size": form.cleaned_data["size"],
+    }
+    try:
+        response = JsonResponse(_complete(params))
+    except (CircuitOpenError, SearchDeadlineExceeded) as exception:
+        return _service_unavailable(exception)
+    patch_cache_control(
+        response, public=True, max_age=AUTOCOMPLETE_CACHE_CONTROL_MAX_AGE
+    )
     return response
 
 
-def _find(params, total_only=False, make_suggestions=False, min_suggestion_score=0.8):
+def _service_unavailable(exception):
+    response = JsonResponse(
+        {"errors": {"__all__": [{"message": "Search is temporarily unavailable"}]}},
+        status=503,
+    )
+    response["Retry-After"] = str(max(1, math.ceil(exception.retry_after)))
+    return response
+
+
+def _complete(params):
+    """Find the documents whose title starts with, or has words that start
+    with, what's been typed so far.
+
+    This is meant to be as cheap as possible for Elasticsearch. Just one
+    prefix query against the title, no highlighting, no suggestions and
+    no counting of the total number of matches.
+    """
+    field = settings.SEARCH_AUTOCOMPLETE_FIELD
     search_query = Search(
         index=settings.SEARCH_INDEX_NAME,
     )
+    # If the field is mapped as a `search_as_you_type` field, its shingle
+    # subfields are what make this fast. If they don't exist, Elasticsearch
+    # simply ignores them and prefix matches on the field itself.
+    search_query = search_query.query(
+        "multi_match",
+        query=params["query"],
+        type="bool_prefix",
+        fields=[field, f"{field}._2gram", f"{field}._3gram"],
+    )
+    if params["locales"]:
+        search_query = search_query.filter("terms", locale=params["locales"])
+    search_query = search_query.sort("_score", "-popularity")
+    search_query = search_query.source(includes=["title", "locale"])
+    search_query = search_query.extra(track_total_hits=False)
+    search_query = search_query[: params["size"]]
+
+    response = _execute(search_query)
+
+    return {
+        "documents": [
+            {
+                "mdn_url": hit.meta.id,
+                "title": hit.title,
+                "locale": hit.locale,
+            }
+            for hit in response
+        ],
+        "metadata": {
+            "took_ms": response.took,
+            "size": params["size"],
+        },
+    }
+
+
+def _find(
+    params,
+    generation,
+    make_suggestions=False,
+    degradation_level=0,
+    min_suggestion_score=0.8,
+):
+    # If there's a spelling dictionary, it makes the suggestions instead of
+    # the term suggesters.
+    dictionary = make_suggestions and _get_spelling_dictionary(params, generation)
+    with timing.phase("build"):
+        search_query = _page_search(
+            params, make_suggestions and not dictionary, degradation_level
+        )
+    with load.timed(), timing.phase("es"):
+        response = _execute(search_query)
+    # How much of that Elasticsearch spent actually searching, as opposed to,
+    # for example, on the network.
+    timing.record("took", response["took"])
+    with timing.phase("unpack"):
+        results = _unpack_response(params, response, degradation_level)
+
+    with timing.phase("suggest"):
+        if dictionary:
+            suggestion = _spelling_suggestion(dictionary, params["query"])
+        else:
+            candidates = _suggestion_candidates(
+                params["query"], response, min_suggestion_score
+            )
+            suggestion = _verify_suggestions(params, candidates)
+    if suggestion:
+        # Since they're sorted by score, it's usually never useful
+        # to suggestion more than exactly 1 good suggestion.
+        results["suggestions"].append(suggestion)
+    return results
+
+
+def _page_search(params, make_suggestions=False, degradation_level=0):
+    """Return the `Search` for the page of results to render, suggesters
+    included if `make_suggestions`. Executing it returns the raw response,
+    trimmed down to the `FILTER_PATH`, as a plain dict."""
+    phrases = degradation_level < 2
+    highlight = degradation_level < 3
+    if settings.SEARCH_COMPILED_QUERIES:
+        search_query = _compiled_search(params, make_suggestions, phrases, highlight)
+    else:
+        search_query = _build_search(params, phrases=phrases, highlight=highlight)
+        if make_suggestions:
+            search_query = _add_suggesters(search_query, params["query"])
+    return search_query.params(
+        filter_path=FILTER_PATH, **_search_limits()
+    ).response_class(_raw_response)
+
+
+def _search_limits():
+    """Return the request parameters that bound how much work Elasticsearch
+    puts into the search. Whatever it found within those is still returned,
+    just flagged as partial."""
+    limits = {}
+    if settings.SEARCH_TRACK_TOTAL_HITS:
+        limits["track_total_hits"] = settings.SEARCH_TRACK_TOTAL_HITS
+    if settings.SEARCH_SHARD_TIMEOUT:
+        limits["timeout"] = settings.SEARCH_SHARD_TIMEOUT
+    if settings.SEARCH_TERMINATE_AFTER:
+        limits["terminate_after"] = settings.SEARCH_TERMINATE_AFTER
+    return limits
+
+
+def _raw_response(search_query, response):
+    # No point in wrapping every hit in `AttrDict`s, only to pluck a few
+    # values out of each.
+    return response
+
+
+# The values that the bodies, to be compiled, are built with. They are what
+# get replaced with slots. See `kuma.api.v1.search.compiled`.
+_QUERY = "\x00query\x00"
+_PHRASE = "\x00query phrase\x00"
+_LOCALE = "\x00locale\x00"
+_SLUG_PREFIXES = ("\x00slug_prefix_0\x00", "\x00slug_prefix_1\x00")
+_SEARCH_AFTER = "\x00search_after\x00"
+_SLOTS = (
+    ("query", _QUERY),
+    ("query", _PHRASE),
+    ("locales", [_LOCALE]),
+    ("slug_prefix_queries", [{"prefix": {"slug": x}} for x in _SLUG_PREFIXES]),
+    ("slug_prefix_terms", list(_SLUG_PREFIXES)),
+    ("search_after", [_SEARCH_AFTER]),
+)
+
+
+def _compiled_search(params, make_suggestions, phrases, highlight):
+    """Same as `_build_search` (and `_add_suggesters`) but rendered from a
+    precompiled body."""
+    slug_prefixes = params["slug_prefixes"]
+    render = _get_compiled_body(
+        params["sort"],
+        phrases and " " in params["query"],
+        bool(params["locales"]),
+        bool(slug_prefixes),
+        settings.SEARCH_SLUG_HIERARCHY_FIELD,
+        bool(params["cursor"]),
+        highlight,
+        make_suggestions,
+    )
+    if params["cursor"]:
+        start = 0
+    else:
+        start = params["size"] * (params["page"] - 1)
+    body = render(
+        {
+            "query": params["query"],
+            "locales": params["locales"],
+            "slug_prefix_queries": [{"prefix": {"slug": x}} for x in slug_prefixes],
+            "slug_prefix_terms": _slug_hierarchy_terms(slug_prefixes),
+            "search_after": params["cursor"],
+            "from": start,
+            "size": params["size"],
+        }
+    )
+    return CompiledSearch(body, index=settings.SEARCH_INDEX_NAME)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_compiled_body(
+    sort,
+    phrase,
+    locales,
+    slug_prefixes,
+    slug_hierarchy_field,
+    cursor,
+    highlight,
+    make_suggestions,
+):
+    """Return the compiled body for this shape of search. The
+    `slug_hierarchy_field` is only there because it changes the shape too."""
+    query_string = _PHRASE if phrase else _QUERY
+    params = {
+        "locales": [_LOCALE] if locales else [],
+        "query": query_string,
+        "size": 1,
+        "page": 1,
+        "sort": sort,
+        "slug_prefixes": list(_SLUG_PREFIXES) if slug_prefixes else [],
+        "cursor": [_SEARCH_AFTER] if cursor else None,
+    }
+    search_query = _build_search(params, highlight=highlight)
     if make_suggestions:
-        # XXX research if it it's better to use phrase suggesters and if
-        # that works
-        # https://www.elastic.co/guide/en/elasticsearch/reference/current/search-suggesters.html#phrase-suggester
-        search_query = search_query.suggest(
-            "title_suggestions", params["query"], term={"field": "title"}
+        search_query = _add_suggesters(search_query, query_string)
+    body = _slotted(search_query.to_dict())
+    body["from"] = Slot("from")
+    body["size"] = Slot("size")
+    return compile_body(body)
+
+
+def _slotted(node):
+    for name, value in _SLOTS:
+        if node == value:
+            return Slot(name)
+    if isinstance(node, dict):
+        return {key: _slotted(value) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_slotted(value) for value in node]
+    return node
+
+
+def _build_search(params, phrases=True, highlight=True):
+    """Return the `Search` instance for the page of results to render."""
+    search_query = _build_query(params, phrases=phrases)
+
+    if highlight:
+        search_query = search_query.highlight_options(
+            pre_tags=["<mark>"],
+            post_tags=["</mark>"],
+            number_of_fragments=3,
+            fragment_size=120,
+            encoder="html",
+        )
+        search_query = search_query.highlight("title", "body")
+
+    search_query = search_query.source(includes=SOURCE_FIELDS)
+
+    if params["cursor"]:
+        search_query = search_query.extra(search_after=params["cursor"])
+        search_query = search_query[: params["size"]]
+    else:
+        search_query = search_query[
+            params["size"] * (params["page"] - 1) : params["size"] * params["page"]
+        ]
+    return search_query
+
+
+def _add_suggesters(search_query, query_string):
+    # XXX research if it it's better to use phrase suggesters and if
+    # that works
+    # https://www.elastic.co/guide/en/elasticsearch/reference/current/search-suggesters.html#phrase-suggester
+    search_query = search_query.suggest(
+        "title_suggestions", query_string, term={"field": "title"}
+    )
+    search_query = search_query.suggest(
+        "body_suggestions", query_string, term={"field": "body"}
+    )
+    return search_query
+
+
+def _unpack_response(params, response, degradation_level=0):
+    """Turn the (raw) Elasticsearch response into the results to render,
+    except for the suggestions which are left empty."""
+    total = response["hits"]["total"]
+    metadata = {
+        "took_ms": response["took"],
+        "total": {"value": total["value"], "relation": total["relation"]},
+        "size": params["size"],
+        "page": params["page"],
+        "next_cursor": None,
+        # How much was left out of the search, to go easy on Elasticsearch.
+        # See `kuma.api.v1.search.load`.
+        "degradation_level": degradation_level,
+        # Whether the search ran out of time (or documents, see
+        # `_search_limits`) before it was done.
+        "partial": bool(response.get("timed_out") or response.get("terminated_early")),
+    }
+    # With the `filter_path`, there are no `hits.hits` at all if nothing
+    # was found.
+    hits = response["hits"].get("hits", [])
+    documents = []
+    for hit in hits:
+        source = hit["_source"]
+        highlight = hit.get("highlight", {})
+        documents.append(
+            {
+                "mdn_url": hit["_id"],
+                "score": hit["_score"],
+                "title": source["title"],
+                "locale": source["locale"],
+                "slug": source["slug"],
+                "popularity": source["popularity"],
+                "summary": source["summary"],
+                "highlight": {
+                    "body": highlight.get("body", []),
+                    "title": highlight.get("title", []),
+                },
+            }
         )
-        search_query = search_query.suggest(
-            "body_suggestions", params["query"], term={"field": "body"}
+
+    if len(documents) == params["size"] and "sort" in hits[-1]:
+        # There might be more. Where to continue from is dictated by how the
+        # last hit sorted.
+        metadata["next_cursor"] = encode_cursor(
+            params["sort"] or "best", hits[-1]["sort"]
         )
 
+    return {
+        "documents": documents,
+        "metadata": metadata,
+        "suggestions": [],
+    }
+
+
+def _suggestion_candidates(query_string, response, min_suggestion_score=0.8):
+    """Return the distinct alternative spellings the suggesters came up with,
+    best first."""
+    suggest = response.get("suggest")
+    if not suggest:
+        return []
+
+    suggestion_strings = _unpack_suggestions(
+        query_string,
+        suggest,
+        ("body_suggestions", "title_suggestions"),
+    )
+    candidates = []
+    for score, string in suggestion_strings:
+        if (score > min_suggestion_score or 1) and string not in candidates:
+            candidates.append(string)
+    return candidates[:MAX_SUGGESTION_CANDIDATES]
+
+
+def _build_query(params, phrases=True):
+    """Return the `Search` instance that finds the documents that match the
+    query, without any of the extras (highlighting, suggestions, source
+    filtering, pagination) that only matter for rendering the results.
+
+    Leaving out the `phrases` sub-queries makes for a cheaper, if less
+    precise, search.
+    """
+    search_query = Search(
+        index=settings.SEARCH_INDEX_NAME,
+    )
+
     # The business logic here that we search for things different ways,
     # and each different way as a different boost which dictates its importance.
     # The importance order is as follows:
@@ -122,7 +630,7 @@ def _find(params, total_only=False, make_suggestions=False, min_suggestion_score
     sub_queries = []
     sub_queries.append(Q("match", title={"query": params["query"], "boost": 5.0}))
     sub_queries.append(Q("match", body={"query": params["query"], "boost": 1.0}))
-    if " " in params["query"]:
+    if phrases and " " in params["query"]:
         sub_queries.append(
             Q("match_phrase", title={"query": params["query"], "boost": 10.0})
         )
@@ -136,25 +644,22 @@ def _find(params, total_only=False, make_suggestions=False, min_suggestion_score
         search_query = search_query.filter("terms", locale=params["locales"])
 
     if params["slug_prefixes"]:
-        sub_queries = [Q("prefix", slug=x) for x in params["slug_prefixes"]]
-        search_query = search_query.query(query.Bool(should=sub_queries))
-
-    search_query = search_query.highlight_options(
-        pre_tags=["<mark>"],
-        post_tags=["</mark>"],
-        number_of_fragments=3,
-        fragment_size=120,
-        encoder="html",
-    )
-    search_query = search_query.highlight("title", "body")
-
+        # It's only a filter. Being under any of the prefixes doesn't make a
+        # document any more relevant than another one. And this way,
+        # Elasticsearch can cache it.
+        search_query = search_query.filter(_slug_prefix_filter(params["slug_prefixes"]))
+
+    # Each sort ends with the document ID as a tiebreaker. That makes the
+    # order stable, which is what makes it possible to continue from the
+    # sort values of the last hit with `search_after`.
     if params["sort"] == "relevance":
-        search_query = search_query.sort("_score", "-popularity")
+        search_query = search_query.sort("_score", "-popularity", "_id")
         search_query = search_query.query(sub_query)
     elif params["sort"] == "popularity":
-        search_query = search_query.sort("-popularity", "_score")
+        search_query = search_query.sort("-popularity", "_score", "_id")
         search_query = search_query.query(sub_query)
     else:
+        search_query = search_query.sort("_score", "-popularity", "_id")
         popularity_factor = 10.0
         boost_mode = "sum"
         score_mode = "max"
@@ -173,121 +678,164 @@ def _find(params, total_only=False, make_suggestions=False, min_suggestion_score
             score_mode=score_mode,
         )
 
-    search_query = search_query.source(excludes=["body"])
-
-    search_query = search_query[
-        params["size"] * (params["page"] - 1) : params["size"] * params["page"]
-    ]
-
-    retry_options = {
-        "retry_exceptions": (
-            # This is the standard operational exception.
-            exceptions.ConnectionError,
-            # This can happen if the search happened right as the index had
-            # just been deleted due to a fresh re-indexing happening in Yari.
-            exceptions.NotFoundError,
-            # This can happen when the index simply isn't ready yet.
-            exceptions.TransportError,
-        ),
-        # The default in redo is 60 seconds. Let's tone that down.
-        "sleeptime": settings.ES_RETRY_SLEEPTIME,
-        "attempts": settings.ES_RETRY_ATTEMPTS,
-        "jitter": settings.ES_RETRY_JITTER,
-    }
-    with retrying(search_query.execute, **retry_options) as retrying_function:
-        response = retrying_function()
+    return search_query
 
-    if total_only:
-        return response.hits.total
 
-    metadata = {
-        "took_ms": response.took,
-        "total": {
-            # The `response.hits.total` is a `elasticsearch_dsl.utils.AttrDict`
-            # instance. Pluck only the exact data needed.
-            "value": response.hits.total.value,
-            "relation": response.hits.total.relation,
-        },
-        "size": params["size"],
-        "page": params["page"],
-    }
-    documents = []
-    for hit in response:
-        try:
-            body_highlight = list(hit.meta.highlight.body)
-        except AttributeError:
-            body_highlight = []
-        try:
-            title_highlight = list(hit.meta.highlight.title)
-        except AttributeError:
-            title_highlight = []
-
-        d = {
-            "mdn_url": hit.meta.id,
-            "score": hit.meta.score,
-            "title": hit.title,
-            "locale": hit.locale,
-            "slug": hit.slug,
-            "popularity": hit.popularity,
-            "summary": hit.summary,
-            "highlight": {
-                "body": body_highlight,
-                "title": title_highlight,
-            },
-        }
-        documents.append(d)
+def _slug_prefix_filter(slug_prefixes):
+    field = settings.SEARCH_SLUG_HIERARCHY_FIELD
+    if field:
+        # A `path_hierarchy` tokenized field has a term for every ancestor of
+        # the slug. So, finding those under a prefix is a single term lookup.
+        return Q("terms", **{field: _slug_hierarchy_terms(slug_prefixes)})
+    return query.Bool(should=[Q("prefix", slug=x) for x in slug_prefixes])
 
-    try:
-        suggest = getattr(response, "suggest")
-    except AttributeError:
-        suggest = None
-
-    suggestions = []
-    if suggest:
-        suggestion_strings = _unpack_suggestions(
-            params["query"],
-            response.suggest,
-            ("body_suggestions", "title_suggestions"),
-        )
 
-        for score, string in suggestion_strings:
-            if score > min_suggestion_score or 1:
-                # Sure, this is different way to spell, but what will it yield
-                # if you actually search it?
-                total = _find(dict(params, query=string), total_only=True)
-                if total["value"] > 0:
-                    suggestions.append(
-                        {
-                            "text": string,
-                            "total": {
-                                # This 'total' is an `AttrDict` instance.
-                                "value": total.value,
-                                "relation": total.relation,
-                            },
-                        }
-                    )
-                    # Since they're sorted by score, it's usually never useful
-                    # to suggestion more than exactly 1 good suggestion.
-                    break
+def _slug_hierarchy_terms(slug_prefixes):
+    return [x.rstrip("/") for x in slug_prefixes]
 
+
+RETRY_EXCEPTIONS = (
+    # This is the standard operational exception.
+    exceptions.ConnectionError,
+    # This can happen if the search happened right as the index had
+    # just been deleted due to a fresh re-indexing happening in Yari.
+    exceptions.NotFoundError,
+    # This can happen when the index simply isn't ready yet.
+    exceptions.TransportError,
+)
+
+
+class RetryBudget:
+    """Keeps track of how many more attempts, and how much more time, are
+    left for a search.
+
+    Failed attempts are retried, with a growing sleep in between, up to
+    `settings.ES_RETRY_ATTEMPTS` times. But never for longer, in total, than
+    `settings.ES_RETRY_DEADLINE` seconds.
+    """
+
+    def __init__(self):
+        self.deadline = time.monotonic() + settings.ES_RETRY_DEADLINE
+        self.attempts = settings.ES_RETRY_ATTEMPTS
+        self.sleeptime = settings.ES_RETRY_SLEEPTIME
+        self.jitter = settings.ES_RETRY_JITTER
+
+    def start_attempt(self):
+        """Return how many seconds the attempt, about to be made, may take."""
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise SearchDeadlineExceeded()
+        self.attempts -= 1
+        return remaining
+
+    def next_sleep(self):
+        """Return how many seconds to sleep before the next attempt, or None
+        if there shouldn't be a next attempt."""
+        if self.attempts <= 0:
+            return None
+        sleep = max(0, self.sleeptime + random.uniform(-self.jitter, self.jitter))
+        if time.monotonic() + sleep >= self.deadline:
+            # Don't bother sleeping if it's going to be too late.
+            return None
+        self.sleeptime *= 1.5
+        self.jitter *= 1.5
+        return sleep
+
+
+def _execute(search_query):
+    """Execute the `Search` (or `MultiSearch`) and return its response.
+
+    Failed attempts are retried within the `RetryBudget`. And not attempted
+    at all if the circuit breaker considers Elasticsearch unavailable.
+    """
+    budget = RetryBudget()
+    with breaker.guard():
+        while True:
+            timeout = budget.start_attempt()
+            try:
+                return hedging.execute(search_query.params(request_timeout=timeout))
+            except RETRY_EXCEPTIONS:
+                sleep = budget.next_sleep()
+                if sleep is None:
+                    raise
+                time.sleep(sleep)
+
+
+def _verify_suggestions(params, candidates):
+    """Sure, each candidate is a different way to spell, but what will it
+    yield if you actually search it?
+
+    Instead of searching for each candidate, one after the other, all of them
+    are counted in a single multi-search round trip. The first candidate,
+    in the order given, that would yield any results wins.
+    """
+    if not candidates:
+        return None
+    responses = _execute(_build_verification(params, candidates))
+    return _pick_suggestion(candidates, responses)
+
+
+def _build_verification(params, candidates):
+    multi_search = MultiSearch(index=settings.SEARCH_INDEX_NAME)
+    for candidate in candidates:
+        # Only the total count is needed, so don't fetch any documents.
+        multi_search = multi_search.add(_build_query(dict(params, query=candidate))[:0])
+    return multi_search
+
+
+def _pick_suggestion(candidates, responses):
+    for candidate, response in zip(candidates, responses):
+        total = response.hits.total
+        if total.value > 0:
+            return {
+                "text": candidate,
+                "total": {
+                    # This 'total' is an `AttrDict` instance.
+                    "value": total.value,
+                    "relation": total.relation,
+                },
+            }
+    return None
+
+
+def _get_spelling_dictionary(params, generation):
+    """Return the spelling dictionary to make the suggestions with, if any.
+
+    Its suggestions aren't verified by searching for them. So what it knows
+    about how many documents they find (see `_spelling_suggestion`) has to
+    hold for the search they're made for. Which it doesn't if only some
+    slugs are searched.
+    """
+    if params["slug_prefixes"]:
+        return None
+    return spelling.get_dictionary(params["locales"], generation)
+
+
+def _spelling_suggestion(dictionary, query_string):
+    corrected = dictionary.suggest(query_string)
+    if not corrected:
+        return None
+    text, frequency = corrected
     return {
-        "documents": documents,
-        "metadata": metadata,
-        "suggestions": suggestions,
+        "text": text,
+        # Without searching for it, all that's known is that there are at
+        # least as many as the most common of its words appears in.
+        "total": {"value": frequency, "relation": "gte"},
     }
 
 
 def _unpack_suggestions(query, suggest, keys):
     alternatives = []
     for key in keys:
-        for suggestion in getattr(suggest, key, []):
-            for option in suggestion.options:
+        for suggestion in suggest.get(key, []):
+            offset = suggestion["offset"]
+            for option in suggestion["options"]:
                 alternatives.append(
                     (
-                        option.score,
-                        query[0 : suggestion.offset]
-                        + option.text
-                        + query[suggestion.offset + suggestion.length :],
+                        option["score"],
+                        query[0:offset]
+                        + option["text"]
+                        + query[offset + suggestion["length"] :],
                     )
                 )
     alternatives.sort(reverse=True)  # highest score first
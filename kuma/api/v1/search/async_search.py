@@ -0,0 +1,243 @@
+"""
+An async variant of the `kuma.api.v1.search.search` view, for when Kuma is
+served over ASGI (see `kuma.asgi`). It's used, instead of the sync view,
+when `settings.SEARCH_ASYNC` is true.
+
+Almost all the time spent on a search is spent waiting on Elasticsearch.
+Here, that waiting doesn't tie up a worker. And the page of results, and
+the suggestions (including verifying them), are searched for concurrently,
+rather than one after the other.
+
+Everything, except the talking to Elasticsearch, is shared with the sync
+view. Requires `aiohttp` to be installed.
+"""
+import asyncio
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from elasticsearch import exceptions
+from elasticsearch_dsl import Search
+from elasticsearch_dsl.response import Response
+
+from kuma.api.v1.decorators import allow_CORS_GET
+
+from . import (
+    RETRY_EXCEPTIONS,
+    JsonResponse,
+    RetryBudget,
+    _add_suggesters,
+    _build_verification,
+    _canonical_redirect,
+    _get_params,
+    _get_spelling_dictionary,
+    _not_modified,
+    _page_search,
+    _pick_suggestion,
+    _search_response,
+    _service_unavailable,
+    _should_make_suggestions,
+    _spelling_suggestion,
+    _suggestion_candidates,
+    _unpack_response,
+    load,
+    metrics,
+    querylog,
+    timing,
+)
+from .breaker import CircuitOpenError, SearchDeadlineExceeded, breaker
+from .caching import get_index_generation, make_etag, make_key
+
+# Shared by all the searches, in the same event loop, so that they share the
+# connection pool too. A client can't be shared across event loops, because
+# its connections belong to the loop they were opened in. Over ASGI, there's
+# only the one loop per process. Over WSGI, where every request runs in an
+# event loop of its own, so does every client (which is why SEARCH_ASYNC is
+# only worth it over ASGI).
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """Return the `AsyncElasticsearch` client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        try:
+            from elasticsearch import AsyncElasticsearch
+        except ImportError:
+            raise ImproperlyConfigured("SEARCH_ASYNC requires aiohttp to be installed")
+        client = _clients[loop] = AsyncElasticsearch(hosts=settings.ES_URLS)
+    return client
+
+
+def _sync(func):
+    # None of the cache calls need to run in the main thread.
+    return sync_to_async(func, thread_sensitive=False)
+
+
+@allow_CORS_GET
+@timing.server_timing
+async def search(request, locale=None):
+    with timing.phase("validate"):
+        params, errors = _get_params(request, locale)
+    if errors:
+        return JsonResponse({"errors": errors}, status=400)
+    redirect = _canonical_redirect(request, params, locale)
+    if redirect:
+        return redirect
+    generation = await _sync(get_index_generation)()
+    etag = make_etag(params, generation)
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+
+    level = load.degradation_level()
+    try:
+        results, status = await _find_cached(
+            params,
+            generation,
+            make_suggestions=level < 1 and _should_make_suggestions(params["query"]),
+            degradation_level=level,
+        )
+    except (CircuitOpenError, SearchDeadlineExceeded) as exception:
+        return _service_unavailable(exception)
+    timing.record_cache(status)
+    querylog.log(params, results, status)
+    with timing.phase("render"):
+        return _search_response(results, etag)
+
+
+async def _find_cached(params, generation, **kwargs):
+    """Same as `kuma.api.v1.search.caching.find_cached`, except that identical
+    concurrent searches aren't coalesced. Returns the results and whether
+    they came from the cache."""
+    timeout = settings.SEARCH_RESULTS_CACHE_TIMEOUT
+    if not timeout:
+        return await _find(params, generation, **kwargs), None
+
+    key = make_key(params, generation, **kwargs)
+    results = await _sync(cache.get)(key)
+    if results is not None:
+        await _sync(metrics.incr)("cache.hit")
+        return results, "hit"
+    await _sync(metrics.incr)("cache.miss")
+
+    results = await _find(params, generation, **kwargs)
+    if not results["metadata"].get("partial"):
+        await _sync(cache.set)(key, results, timeout)
+    return results, "miss"
+
+
+async def _find(
+    params,
+    generation,
+    make_suggestions=False,
+    degradation_level=0,
+    min_suggestion_score=0.8,
+):
+    with timing.phase("build"):
+        search_query = _page_search(params, degradation_level=degradation_level)
+    if not make_suggestions:
+        response = await _search_page(search_query)
+        with timing.phase("unpack"):
+            return _unpack_response(params, response, degradation_level)
+
+    dictionary = await _sync(_get_spelling_dictionary)(params, generation)
+    if dictionary:
+        response = await _search_page(search_query)
+        with timing.phase("unpack"):
+            results = _unpack_response(params, response, degradation_level)
+        with timing.phase("suggest"):
+            suggestion = _spelling_suggestion(dictionary, params["query"])
+        if suggestion:
+            results["suggestions"].append(suggestion)
+        return results
+
+    # The suggesters only need the query string, so there's no reason to
+    # wait for the page of results before asking them.
+    suggest_query = _add_suggesters(
+        Search(index=settings.SEARCH_INDEX_NAME)[:0], params["query"]
+    )
+    response, suggestion = await asyncio.gather(
+        _search_page(search_query),
+        _suggest(params, suggest_query, min_suggestion_score),
+    )
+    with timing.phase("unpack"):
+        results = _unpack_response(params, response, degradation_level)
+    if suggestion:
+        results["suggestions"].append(suggestion)
+    return results
+
+
+async def _search_page(search_query):
+    with load.timed(), timing.phase("es"):
+        response = await _search(search_query)
+    timing.record("took", response["took"])
+    return response
+
+
+async def _search(search_query):
+    """Return the raw response, as a plain dict, just like executing the
+    `Search` from `_page_search` does."""
+    return await _execute(
+        lambda timeout: get_client().search(
+            index=settings.SEARCH_INDEX_NAME,
+            body=search_query.to_dict(),
+            request_timeout=timeout,
+            **search_query._params,
+        )
+    )
+
+
+async def _suggest(params, suggest_query, min_suggestion_score):
+    """Return the best suggestion that finds anything, if any."""
+    with timing.phase("suggest"):
+        candidates = _suggestion_candidates(
+            params["query"], await _search(suggest_query), min_suggestion_score
+        )
+        if not candidates:
+            return None
+
+        multi_search = _build_verification(params, candidates)
+        raw = await _execute(
+            lambda timeout: get_client().msearch(
+                index=settings.SEARCH_INDEX_NAME,
+                body=multi_search.to_dict(),
+                request_timeout=timeout,
+            )
+        )
+        responses = []
+        for search_query, response in zip(multi_search._searches, raw["responses"]):
+            # The same as `MultiSearch.execute()` does.
+            if response.get("error", False):
+                raise exceptions.TransportError(
+                    "N/A", response["error"]["type"], response["error"]
+                )
+            responses.append(Response(search_query, response))
+        return _pick_suggestion(candidates, responses)
+
+
+async def _execute(request):
+    """Await `request(timeout)` and return its response. Just like the sync
+    `kuma.api.v1.search._execute`, failed attempts are retried within the
+    `RetryBudget`, and guarded by the circuit breaker."""
+    budget = RetryBudget()
+    probing = await _sync(breaker.allow)()
+    try:
+        while True:
+            timeout = budget.start_attempt()
+            try:
+                response = await request(timeout)
+                break
+            except RETRY_EXCEPTIONS:
+                sleep = budget.next_sleep()
+                if sleep is None:
+                    raise
+                await asyncio.sleep(sleep)
+    except Exception as exception:
+        await _sync(breaker.record)(probing, exception)
+        raise
+    await _sync(breaker.record)(probing)
+    return response
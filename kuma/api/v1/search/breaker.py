@@ -0,0 +1,122 @@
+"""
+A circuit breaker for Elasticsearch, with its state shared by all the web
+workers through the default cache.
+
+While Elasticsearch is healthy, the breaker is "closed" and every search
+goes through. Once too many searches have failed, within a short window
+of time, the breaker "opens" and searches fail fast, without even trying,
+so that web workers aren't tied up waiting on a cluster that's down or in
+the middle of a re-index. After a while, the breaker lets exactly one
+search through ("half-open") as a probe. If that succeeds, the breaker
+closes again. If not, it stays open for another while.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from elasticsearch import exceptions
+
+from . import metrics
+
+
+class CircuitOpenError(Exception):
+    """Elasticsearch is considered unavailable. Try again later."""
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        # How many seconds until it's worth trying again.
+        self.retry_after = retry_after
+
+
+class SearchDeadlineExceeded(Exception):
+    """There's no time left to (re)try the search."""
+
+    def __init__(self):
+        super().__init__()
+        # How many seconds until it's worth trying again. That's as long as
+        # the search was given this time.
+        self.retry_after = settings.ES_RETRY_DEADLINE
+
+
+def is_outage(exception):
+    """Return true if the exception means Elasticsearch is unavailable, as
+    opposed to, for example, it not liking the query it was sent."""
+    if isinstance(exception, (exceptions.ConnectionError, SearchDeadlineExceeded)):
+        return True
+    if isinstance(exception, exceptions.TransportError):
+        # The status code is 'N/A' when there was no response at all.
+        return not isinstance(exception.status_code, int) or (
+            exception.status_code == 429 or exception.status_code >= 500
+        )
+    return False
+
+
+class CircuitBreaker:
+    def __init__(self, name):
+        self.opened_key = f"search:breaker:{name}:opened"
+        self.probe_key = f"search:breaker:{name}:probe"
+        self.failures_key = f"search:breaker:{name}:failures"
+
+    @contextmanager
+    def guard(self):
+        """Raise `CircuitOpenError` if the breaker is open. Otherwise, run
+        the block and keep score of whether Elasticsearch is healthy."""
+        probing = self.allow()
+        try:
+            yield
+        except Exception as exception:
+            self.record(probing, exception)
+            raise
+        else:
+            self.record(probing)
+
+    def allow(self):
+        """Raise `CircuitOpenError` if the breaker is open. Otherwise, return
+        true if the call about to be made is the half-open probe."""
+        opened = cache.get(self.opened_key)
+        if opened is None:
+            return False
+        reset_timeout = settings.SEARCH_BREAKER_RESET_TIMEOUT
+        remaining = opened + reset_timeout - time.time()
+        if remaining > 0:
+            metrics.incr("breaker.rejected")
+            raise CircuitOpenError(remaining)
+        # Only the first one, to get here, gets to probe.
+        if not cache.add(self.probe_key, 1, reset_timeout):
+            metrics.incr("breaker.rejected")
+            raise CircuitOpenError(reset_timeout)
+        return True
+
+    def record(self, probing, exception=None):
+        """Keep score of how the call, let through by `allow()`, went."""
+        if exception is not None:
+            if is_outage(exception):
+                self._record_failure(probing)
+            elif probing:
+                # Inconclusive. Let another request do the probing.
+                cache.delete(self.probe_key)
+        elif probing:
+            cache.delete_many([self.opened_key, self.probe_key, self.failures_key])
+
+    def _record_failure(self, probing):
+        if probing:
+            # Still broken. Stay open for another while.
+            cache.set(self.opened_key, time.time(), timeout=None)
+            cache.delete(self.probe_key)
+            return
+        if cache.add(self.failures_key, 1, settings.SEARCH_BREAKER_FAILURE_WINDOW):
+            failures = 1
+        else:
+            try:
+                failures = cache.incr(self.failures_key)
+            except ValueError:
+                # The window expired just now.
+                failures = 1
+        if failures >= settings.SEARCH_BREAKER_FAILURE_THRESHOLD:
+            metrics.incr("breaker.opened")
+            cache.set(self.opened_key, time.time(), timeout=None)
+            cache.delete(self.failures_key)
+
+
+breaker = CircuitBreaker("elasticsearch")
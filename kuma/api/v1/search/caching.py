@@ -0,0 +1,176 @@
+"""
+Server-side cache of search results, in front of `kuma.api.v1.search._find`.
+
+When the same search is requested many times at the same moment, only the
+first caller (the leader) actually runs it. The others wait, for a short
+while, for the leader to put the results in the cache.
+
+Every cache key is namespaced by the name of the concrete index that
+`settings.SEARCH_INDEX_NAME` points to. When Yari re-indexes, and swaps the
+alias over to a fresh index, all the previously cached results are simply
+never looked up again.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+from elasticsearch import exceptions
+from elasticsearch_dsl.connections import connections
+
+from . import metrics
+from .breaker import CircuitOpenError, breaker
+
+INDEX_GENERATION_KEY = "search:index-generation"
+
+
+def get_index_generation():
+    """Return the name of the concrete index behind `settings.SEARCH_INDEX_NAME`.
+
+    The answer is itself cached, for `settings.SEARCH_INDEX_GENERATION_TIMEOUT`
+    seconds, so that this doesn't cost an Elasticsearch round trip per search.
+
+    If Elasticsearch can't tell, or isn't even asked because the circuit
+    breaker is open, `settings.SEARCH_INDEX_NAME` is returned instead. That
+    answer is only cached for `settings.SEARCH_INDEX_GENERATION_FAILURE_TIMEOUT`
+    seconds, so that not every search has to find out again.
+    """
+    generation = cache.get(INDEX_GENERATION_KEY)
+    if generation is not None:
+        return generation
+    try:
+        probing = breaker.allow()
+        try:
+            aliases = connections.get_connection().indices.get_alias(
+                index=settings.SEARCH_INDEX_NAME,
+                request_timeout=settings.SEARCH_INDEX_GENERATION_REQUEST_TIMEOUT,
+            )
+        except exceptions.TransportError as exception:
+            breaker.record(probing, exception)
+            raise
+        breaker.record(probing)
+    except (CircuitOpenError, exceptions.TransportError):
+        # Not being able to tell is no reason to fail the search.
+        cache.set(
+            INDEX_GENERATION_KEY,
+            settings.SEARCH_INDEX_NAME,
+            settings.SEARCH_INDEX_GENERATION_FAILURE_TIMEOUT,
+        )
+        return settings.SEARCH_INDEX_NAME
+    # If the alias is pointing at more than one index, which can happen
+    # for a brief moment during a swap, treat that as a generation too.
+    generation = ",".join(sorted(aliases)) or settings.SEARCH_INDEX_NAME
+    cache.set(
+        INDEX_GENERATION_KEY, generation, settings.SEARCH_INDEX_GENERATION_TIMEOUT
+    )
+    return generation
+
+
+def make_key(params, generation, **kwargs):
+    """Return the cache key for these search parameters, in this index
+    generation (see `get_index_generation`).
+
+    Parameters that don't change the results are normalized first, so that,
+    for example, `Flex` and `flex` share the same cached results.
+    """
+    return f"search:results:{generation}:{_digest(params, **kwargs)}"
+
+
+def make_etag(params, generation):
+    """Return the ETag of the results of a search with these parameters,
+    which changes whenever the index behind `settings.SEARCH_INDEX_NAME` is
+    swapped. Or None if it can't be told which index that is.
+
+    It's a weak ETag: the results are the same for as long as the index is,
+    but not byte for byte. For example, `took_ms` differs every time, and
+    the suggestions can change once the spelling dictionary has loaded.
+    """
+    if generation == settings.SEARCH_INDEX_NAME:
+        return None
+    digest = hashlib.md5(f"{generation}:{_digest(params)}".encode("utf-8"))
+    return "W/" + quote_etag(digest.hexdigest())
+
+
+def _digest(params, **kwargs):
+    normalized = {
+        "query": " ".join(params["query"].lower().split()),
+        "locales": sorted(params["locales"]),
+        "slug_prefixes": sorted(params["slug_prefixes"]),
+        "size": params["size"],
+        "page": params["page"],
+        "sort": params["sort"] or "best",
+        "cursor": params["cursor"],
+        **kwargs,
+    }
+    return hashlib.md5(
+        json.dumps(normalized, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def find_cached(find, params, generation, **kwargs):
+    """Return the results of `find(params, generation, **kwargs)` and how
+    they were obtained: 'hit' (from the cache), 'coalesced' (from an identical search
+    that was already running) or 'miss'."""
+    timeout = settings.SEARCH_RESULTS_CACHE_TIMEOUT
+    lock_timeout = settings.SEARCH_COALESCE_TIMEOUT
+    if not timeout and not lock_timeout:
+        return find(params, generation, **kwargs), None
+
+    key = make_key(params, generation, **kwargs)
+    if timeout:
+        results = cache.get(key)
+        if results is not None:
+            metrics.incr("cache.hit")
+            return results, "hit"
+        metrics.incr("cache.miss")
+
+    if not lock_timeout:
+        results = find(params, generation, **kwargs)
+        if not _is_partial(results):
+            cache.set(key, results, timeout)
+        return results, "miss"
+
+    lock_key = f"{key}:lock"
+    if not cache.add(lock_key, 1, lock_timeout):
+        results = _wait_for_leader(key, lock_key, lock_timeout)
+        if results is not None:
+            metrics.incr("coalesce.wait")
+            return results, "coalesced"
+        # The leader either failed or is taking too long. Don't keep the user
+        # waiting any longer than that.
+        metrics.incr("coalesce.timeout")
+        return find(params, generation, **kwargs), "miss"
+
+    try:
+        results = find(params, generation, **kwargs)
+        # Even if caching is disabled, or the results are only partial, the
+        # followers need somewhere to pick up the results from.
+        if not timeout or _is_partial(results):
+            cache.set(key, results, lock_timeout)
+        else:
+            cache.set(key, results, timeout)
+    finally:
+        cache.delete(lock_key)
+    return results, "miss"
+
+
+def _is_partial(results):
+    # Another try might well find everything.
+    return results["metadata"].get("partial", False)
+
+
+def _wait_for_leader(key, lock_key, lock_timeout):
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(settings.SEARCH_COALESCE_POLL_INTERVAL)
+        results = cache.get(key)
+        if results is not None:
+            return results
+        if cache.get(lock_key) is None:
+            # The leader is done, but it didn't leave any results behind.
+            # It's possible the results were set just before the lock was
+            # released, so check one last time.
+            return cache.get(key)
+    return None
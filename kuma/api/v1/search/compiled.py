@@ -0,0 +1,72 @@
+"""
+Precompiled search request bodies.
+
+Building a search with `elasticsearch_dsl` means creating a whole tree of
+`Search`, `Q`, `Bool`, etc. objects, per request, only to serialize them
+straight back into a dict. But for any one shape of search (the sort, if
+the query is a phrase, etc.), that dict only ever differs by a handful of
+values: the query string, the locales, and so on.
+
+So, instead, each shape of search is built with `elasticsearch_dsl` only
+once, with a `Slot` where each of those values goes. That gets compiled
+into a function that renders the body, given the values for the slots,
+without building anything that isn't a slot's value or on the way to one.
+"""
+from elasticsearch_dsl import Search
+
+
+class Slot:
+    """Where a value goes in a body that gets compiled."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Slot({self.name!r})"
+
+
+def compile_body(body):
+    """Return a function that renders the `body`, given a dict of the values
+    for its slots.
+
+    Everything that doesn't lead to any slot is shared by all the rendered
+    bodies, so they must never be changed in place.
+    """
+    render, _ = _compile(body)
+    return render
+
+
+def _compile(node):
+    # Return the function that renders the node, and whether it always
+    # returns the very same thing.
+    if isinstance(node, Slot):
+        name = node.name
+        return (lambda values: values[name]), False
+    if isinstance(node, dict):
+        items = [(key, *_compile(value)) for key, value in node.items()]
+        if all(constant for _, _, constant in items):
+            return (lambda values: node), True
+        return (lambda values: {key: render(values) for key, render, _ in items}), False
+    if isinstance(node, list):
+        items = [_compile(value) for value in node]
+        if all(constant for _, constant in items):
+            return (lambda values: node), True
+        return (lambda values: [render(values) for render, _ in items]), False
+    return (lambda values: node), True
+
+
+class CompiledSearch(Search):
+    """A `Search` that sends a body rendered by `compile_body`, rather than
+    one serialized from `elasticsearch_dsl` objects."""
+
+    def __init__(self, body=None, **kwargs):
+        super().__init__(**kwargs)
+        self._body = body
+
+    def _clone(self):
+        s = super()._clone()
+        s._body = self._body
+        return s
+
+    def to_dict(self, count=False, **kwargs):
+        return self._body
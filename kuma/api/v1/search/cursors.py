@@ -0,0 +1,46 @@
+"""
+Opaque cursors for paginating search results with `search_after`.
+
+A cursor is the sort values of the last hit on a page, plus the sort mode
+those values belong to, encoded so that clients don't have to (and aren't
+tempted to) understand them.
+"""
+import base64
+import binascii
+import json
+
+# Every sort is two fields plus the document ID as a tiebreaker.
+SORT_VALUES_LENGTH = 3
+
+
+class InvalidCursor(ValueError):
+    """The cursor wasn't made by `encode_cursor`."""
+
+
+def encode_cursor(sort, after):
+    data = json.dumps({"sort": sort, "after": after}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Return the sort mode and the `search_after` values of the cursor."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        sort, after = data["sort"], data["after"]
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(cursor) from e
+    if not isinstance(sort, str) or not isinstance(after, list):
+        raise InvalidCursor(cursor)
+    if len(after) != SORT_VALUES_LENGTH or not all(map(_is_sort_value, after)):
+        # Anything else would only get as far as Elasticsearch, and fail there.
+        raise InvalidCursor(cursor)
+    return sort, after
+
+
+def _is_sort_value(value):
+    # Sort values are numbers (the score or popularity, which can be null
+    # when missing) or strings (the document ID). Booleans are ints to
+    # Python, but never a sort value.
+    if isinstance(value, bool):
+        return False
+    return value is None or isinstance(value, (int, float, str))
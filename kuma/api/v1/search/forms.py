@@ -2,6 +2,8 @@ from django import forms
 from django.conf import settings
 from django.utils.datastructures import MultiValueDict
 
+from .cursors import InvalidCursor, decode_cursor
+
 
 class TypedMultipleValueField(forms.TypedMultipleChoiceField):
     """Unlike TypedMultipleChoiceField we don't care what the individual values
@@ -23,7 +25,30 @@ class MultipleChoiceFieldICase(forms.MultipleChoiceField):
         return str(value).lower() in [x[0].lower() for x in self.choices]
 
 
-class SearchForm(forms.Form):
+class InitialDataMixin:
+    """Makes the `initial` values the defaults for anything not in the data."""
+
+    def __init__(self, data, **kwargs):
+        initial = kwargs.get("initial", {})
+        # This makes it possible to supply `initial={some dict}` to the form
+        # and have its values become part of the default. Normally, in Django,
+        # the `SomeForm(data, initial={...})` is just used to prepopulate the
+        # HTML generated form widgets.
+        # See https://www.peterbe.com/plog/initial-values-bound-django-form-rendered
+        data = MultiValueDict({**{k: [v] for k, v in initial.items()}, **data})
+
+        # If, for keys we have an initial value for, it was passed an empty string,
+        # then swap it for the initial value.
+        # For example `?q=searching&page=` you probably meant to omit it
+        # but "allowing" it to be an empty string makes it convenient for the client.
+        for key, values in data.items():
+            if key in initial and values == "":
+                data[key] = initial[key]
+
+        super().__init__(data, **kwargs)
+
+
+class SearchForm(InitialDataMixin, forms.Form):
     q = forms.CharField(max_length=settings.ES_Q_MAXLENGTH)
     locale = MultipleChoiceFieldICase(
         required=False,
@@ -42,21 +67,36 @@ class SearchForm(forms.Form):
 
     slug_prefix = TypedMultipleValueField(required=False)
 
-    def __init__(self, data, **kwargs):
-        initial = kwargs.get("initial", {})
-        # This makes it possible to supply `initial={some dict}` to the form
-        # and have its values become part of the default. Normally, in Django,
-        # the `SomeForm(data, initial={...})` is just used to prepopulate the
-        # HTML generated form widgets.
-        # See https://www.peterbe.com/plog/initial-values-bound-django-form-rendered
-        data = MultiValueDict({**{k: [v] for k, v in initial.items()}, **data})
+    # Opaque value, from a previous search's `metadata.next_cursor`, for
+    # continuing from where that page of results ended. Unlike `page`,
+    # this works at any depth.
+    cursor = forms.CharField(required=False)
 
-        # If, for keys we have an initial value for, it was passed an empty string,
-        # then swap it for the initial value.
-        # For example `?q=searching&page=` you probably meant to omit it
-        # but "allowing" it to be an empty string makes it convenient for the client.
-        for key, values in data.items():
-            if key in initial and values == "":
-                data[key] = initial[key]
+    def clean_cursor(self):
+        cursor = self.cleaned_data["cursor"]
+        if not cursor:
+            return None
+        try:
+            return decode_cursor(cursor)
+        except InvalidCursor:
+            raise forms.ValidationError("Invalid cursor", code="invalid")
 
-        super().__init__(data, **kwargs)
+    def clean(self):
+        cleaned_data = super().clean()
+        cursor = cleaned_data.get("cursor")
+        if cursor and cursor[0] != (cleaned_data.get("sort") or "best"):
+            # The sort values in the cursor only make sense with the same sort.
+            self.add_error(
+                "cursor",
+                forms.ValidationError("Cursor is for a different sort", code="invalid"),
+            )
+        return cleaned_data
+
+
+class AutocompleteForm(InitialDataMixin, forms.Form):
+    q = forms.CharField(max_length=settings.ES_Q_MAXLENGTH)
+    locale = MultipleChoiceFieldICase(
+        required=False,
+        choices=[(code, name) for code, name in settings.LANGUAGES],
+    )
+    size = forms.IntegerField(required=True, min_value=1, max_value=20)
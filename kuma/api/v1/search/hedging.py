@@ -0,0 +1,163 @@
+"""
+Hedged searches, so that one slow Elasticsearch node (say, in the middle of
+a long GC pause) doesn't make for a slow search.
+
+Each search goes to one of the `settings.ES_URLS`, in turn. If it hasn't
+answered within the `settings.SEARCH_HEDGE_PERCENTILE` percentile of how
+long searches have recently taken, the same search is also sent to the
+next node, and whichever answers first wins. The other one is cancelled
+if it hasn't started yet, or else left to finish in the background, which
+the `request_timeout` of the search puts a bound on.
+
+Only when there are workers to spare for both the search and its hedge
+(see `settings.SEARCH_HEDGE_MAX_WORKERS`) is a search hedged at all. When
+they're all busy, whether with other searches or with the losers of earlier
+hedges, the search is sent unhedged instead, rather than queued up behind
+them.
+
+Every web worker keeps track of the recent response times for itself, of
+the first node each search was sent to, since those are what the delay is
+about. Until it has seen enough of them, it doesn't hedge at all.
+"""
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from time import perf_counter
+
+from django.conf import settings
+
+from . import metrics
+
+# How many of the most recent response times the percentile is taken of.
+WINDOW = 1000
+
+# How many response times it takes to have any idea what's slow.
+MIN_SAMPLES = 50
+
+# How often (in response times recorded) the percentile is worked out again.
+RECOMPUTE_EVERY = 50
+
+_lock = threading.Lock()
+_latencies = deque(maxlen=WINDOW)
+_recorded = 0
+_threshold = None
+_rotation = itertools.count()
+_executor = None
+# How many of the executor's workers are taken, or spoken for.
+_in_flight = 0
+
+
+def node_alias(host):
+    """Return the name of the `elasticsearch_dsl` connection to just that
+    host. See `kuma.api.apps.APIConfig.ready`."""
+    return f"node:{host}"
+
+
+def record(ms):
+    global _recorded, _threshold
+    with _lock:
+        _latencies.append(ms)
+        _recorded += 1
+        if len(_latencies) >= MIN_SAMPLES and (
+            _threshold is None or _recorded % RECOMPUTE_EVERY == 0
+        ):
+            ordered = sorted(_latencies)
+            index = len(ordered) * settings.SEARCH_HEDGE_PERCENTILE // 100
+            _threshold = ordered[min(index, len(ordered) - 1)]
+
+
+def delay():
+    """Return how many seconds to wait for a search before hedging it, or
+    None if it's not yet known what's slow."""
+    if _threshold is None:
+        return None
+    return max(_threshold, settings.SEARCH_HEDGE_MIN_DELAY) / 1000
+
+
+def reset():
+    global _recorded, _threshold, _rotation
+    with _lock:
+        _latencies.clear()
+        _recorded = 0
+        _threshold = None
+        _rotation = itertools.count()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.SEARCH_HEDGE_MAX_WORKERS,
+                thread_name_prefix="search-hedge",
+            )
+        return _executor
+
+
+def _reserve(workers):
+    """Take that many of the executor's workers, if there are enough that
+    aren't taken yet, and return whether there were."""
+    global _in_flight
+    with _lock:
+        if _in_flight + workers > settings.SEARCH_HEDGE_MAX_WORKERS:
+            return False
+        _in_flight += workers
+        return True
+
+
+def _release(*args):
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+
+
+def _timed_execute(search_query):
+    start = perf_counter()
+    response = search_query.execute()
+    record((perf_counter() - start) * 1000)
+    return response
+
+
+def execute(search_query):
+    """Execute the `Search` (or `MultiSearch`), hedged if hedging is enabled
+    and there's more than one node to hedge with, and return its response."""
+    hosts = settings.ES_URLS
+    if not settings.SEARCH_HEDGE_PERCENTILE or len(hosts) < 2:
+        return search_query.execute()
+
+    metrics.incr("hedge.eligible")
+    first = next(_rotation) % len(hosts)
+    primary_query = search_query.using(node_alias(hosts[first]))
+    if not _reserve(2):
+        metrics.incr("hedge.saturated")
+        return _timed_execute(primary_query)
+
+    executor = _get_executor()
+    primary = executor.submit(_timed_execute, primary_query)
+    primary.add_done_callback(_release)
+    hedging = False
+    try:
+        return primary.result(timeout=delay())
+    except TimeoutError:
+        hedging = True
+    finally:
+        if not hedging:
+            # The worker set aside for the hedge isn't needed after all.
+            _release()
+
+    metrics.incr("hedge.sent")
+    hedge = executor.submit(
+        search_query.using(node_alias(hosts[(first + 1) % len(hosts)])).execute
+    )
+    hedge.add_done_callback(_release)
+    for future in as_completed((primary, hedge)):
+        if future.exception() is None:
+            if future is hedge:
+                metrics.incr("hedge.won")
+                primary.cancel()
+            else:
+                hedge.cancel()
+            return future.result()
+    # Neither worked out. Then it's how the primary failed that counts.
+    return primary.result()
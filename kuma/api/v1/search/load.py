@@ -0,0 +1,82 @@
+"""
+Keeps an eye on how long searches take, so that search can degrade
+gracefully when Elasticsearch is under pressure.
+
+Every search records how long it waited on Elasticsearch. The more that
+(on average) climbs past `settings.SEARCH_DEGRADATION_THRESHOLDS`, the
+more of the expensive extras are left out of the searches:
+
+  0. Nothing. The full query shape.
+  1. No term suggesters ("Did you mean...").
+  2. No match-phrase sub-queries either.
+  3. No highlighting either.
+
+Each web worker judges for itself, from the searches it makes. That's
+good enough, since they all talk to the same Elasticsearch.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .breaker import CircuitOpenError
+
+# How much weight the latest search gets in the moving average.
+ALPHA = 0.2
+
+# To step back down a level, the average has to drop this far below the
+# threshold that made it step up. Otherwise, since degraded searches are
+# cheaper, it would just flip back and forth.
+HYSTERESIS = 0.75
+
+MAX_LEVEL = 3
+
+_lock = threading.Lock()
+_average = 0.0
+_level = 0
+
+
+def record(took_ms):
+    """Update the moving average with how long a search took, in ms."""
+    global _average, _level
+    thresholds = settings.SEARCH_DEGRADATION_THRESHOLDS
+    with _lock:
+        _level = min(_level, len(thresholds))
+        _average += ALPHA * (took_ms - _average)
+        while _level < min(MAX_LEVEL, len(thresholds)) and (
+            _average >= thresholds[_level]
+        ):
+            _level += 1
+        while _level > 0 and _average < thresholds[_level - 1] * HYSTERESIS:
+            _level -= 1
+
+
+@contextmanager
+def timed():
+    """Record how long the block, that searches, took. Searches that fail
+    fast, because the circuit breaker is open, don't count."""
+    start = time.monotonic()
+    try:
+        yield
+    except CircuitOpenError:
+        raise
+    except Exception:
+        record((time.monotonic() - start) * 1000)
+        raise
+    else:
+        record((time.monotonic() - start) * 1000)
+
+
+def degradation_level():
+    """Return how degraded (0 to 3) the searches should be right now."""
+    if not settings.SEARCH_DEGRADATION_THRESHOLDS:
+        return 0
+    return _level
+
+
+def reset():
+    global _average, _level
+    with _lock:
+        _average = 0.0
+        _level = 0
@@ -0,0 +1,143 @@
+"""
+Counters, and histograms of how long each phase of a search takes, about how
+search behaves, shared by all the web workers through the default cache.
+
+Incrementing a counter, or observing a timing, only touches a process-local
+tally. A background thread adds the tallies to the shared counters every
+`settings.SEARCH_METRICS_FLUSH_INTERVAL` seconds, so that keeping score
+doesn't cost a single cache round trip on the way to responding to a search
+(which, in the async view, would block the event loop).
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+log = logging.getLogger("kuma.api.v1.search.metrics")
+
+KEY_PREFIX = "search:metrics:"
+
+# Every counter that can be incremented. Listing them here is what makes it
+# possible for `snapshot()` to report on them, from any process.
+COUNTERS = (
+    "cache.hit",
+    "cache.miss",
+    "coalesce.wait",
+    "coalesce.timeout",
+    "breaker.opened",
+    "breaker.rejected",
+    "hedge.eligible",
+    "hedge.sent",
+    "hedge.won",
+    "hedge.saturated",
+    "querylog.dropped",
+)
+
+# Every phase that can be timed. See `kuma.api.v1.search.timing`.
+PHASES = ("validate", "build", "es", "took", "suggest", "unpack", "render", "total")
+
+# The upper bounds, in milliseconds, of the histograms' buckets.
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_lock = threading.Lock()
+_pending = Counter()
+_flusher = None
+
+
+def incr(name, delta=1):
+    assert name in COUNTERS, name
+    _add({KEY_PREFIX + name: delta})
+
+
+def observe(phase, ms):
+    """Add how many milliseconds a phase of a search took to its histogram."""
+    assert phase in PHASES, phase
+    bucket = next((str(x) for x in BUCKETS if ms <= x), "+Inf")
+    prefix = f"{KEY_PREFIX}timing:{phase}:"
+    # The sum is kept in microseconds, since the cache can only add integers.
+    _add({prefix + bucket: 1, prefix + "count": 1, prefix + "sum": round(ms * 1000)})
+
+
+def _add(deltas):
+    with _lock:
+        _pending.update(deltas)
+    if not settings.SEARCH_METRICS_FLUSH_INTERVAL:
+        # Right away, on the request path. Only meant for the tests.
+        flush()
+    elif _flusher is None:
+        _start()
+
+
+def _start():
+    global _flusher
+    with _lock:
+        if _flusher is not None:
+            return
+        _flusher = threading.Thread(
+            target=_flush_forever, name="search-metrics", daemon=True
+        )
+        _flusher.start()
+        atexit.register(flush)
+
+
+def _flush_forever():
+    while True:
+        time.sleep(settings.SEARCH_METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            # The tallies taken out of `_pending` are lost, but the thread
+            # carries on.
+            log.exception("Could not flush the search metrics")
+
+
+def flush():
+    """Add this process' tallies to the shared counters."""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    for key, delta in pending.items():
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # The counter doesn't exist yet. Unless another process beat
+            # us to creating it, start it off with this delta.
+            if not cache.add(key, delta, timeout=None):
+                cache.incr(key, delta)
+
+
+def snapshot():
+    """Return the current value of every counter, across all processes."""
+    values = cache.get_many([KEY_PREFIX + name for name in COUNTERS])
+    return {name: values.get(KEY_PREFIX + name, 0) for name in COUNTERS}
+
+
+def timings():
+    """Return the histogram of every phase, across all processes. Just like
+    Prometheus' histograms, each bucket counts the searches that took up to
+    that many milliseconds, including those in the smaller buckets."""
+    buckets = [str(x) for x in BUCKETS] + ["+Inf"]
+    values = cache.get_many(
+        [
+            f"{KEY_PREFIX}timing:{phase}:{name}"
+            for phase in PHASES
+            for name in buckets + ["count", "sum"]
+        ]
+    )
+    histograms = {}
+    for phase in PHASES:
+        prefix = f"{KEY_PREFIX}timing:{phase}:"
+        cumulative = 0
+        histogram = histograms[phase] = {
+            "count": values.get(prefix + "count", 0),
+            "sum_ms": values.get(prefix + "sum", 0) / 1000,
+            "buckets": {},
+        }
+        for bucket in buckets:
+            cumulative += values.get(prefix + bucket, 0)
+            histogram["buckets"][bucket] = cumulative
+    return histograms
@@ -0,0 +1,136 @@
+"""
+A sampled log of the searches people make, for sizing the caches, warming
+them, and reproducing slow searches.
+
+Logging a search only appends an entry to an in-process ring buffer, which
+never blocks and, when it's full, drops the oldest entries. A background
+thread flushes the buffer in batches, every
+`settings.SEARCH_QUERY_LOG_FLUSH_INTERVAL` seconds, either to the JSON lines
+file `settings.SEARCH_QUERY_LOG_FILE` or, if that's not set, to a Redis
+stream (through the default cache's connection). So there is never any I/O
+on the way to responding to a search.
+
+Entries that are dropped, whether the buffer overflowed or they couldn't be
+written out, are counted by the `querylog.dropped` search metric.
+
+See the `search_query_log` management command for what to make of it.
+"""
+import atexit
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from . import metrics
+
+# Not `log`, which is what logs a search.
+logger = logging.getLogger("kuma.api.v1.search.querylog")
+
+# The Redis stream the entries are added to, when not written to a file.
+STREAM_KEY = "search:query-log"
+
+_buffer = None
+_lock = threading.Lock()
+_flusher = None
+
+
+def log(params, results, cache_status):
+    """Maybe (see `settings.SEARCH_QUERY_LOG_SAMPLE_RATE`) log the search."""
+    rate = settings.SEARCH_QUERY_LOG_SAMPLE_RATE
+    if not rate or random.random() >= rate:
+        return
+    if _flusher is None:
+        _start()
+    metadata = results["metadata"]
+    if len(_buffer) == _buffer.maxlen:
+        # The oldest entry is about to make room for this one.
+        metrics.incr("querylog.dropped")
+    _buffer.append(
+        {
+            "timestamp": round(time.time(), 3),
+            "query": params["query"],
+            "locales": sorted(params["locales"]),
+            "sort": params["sort"] or "best",
+            "size": params["size"],
+            "page": params["page"],
+            "slug_prefixes": sorted(params["slug_prefixes"]),
+            "cursor": bool(params["cursor"]),
+            "took_ms": metadata["took_ms"],
+            "total": metadata["total"]["value"],
+            "cache": cache_status,
+        }
+    )
+
+
+def _start():
+    global _buffer, _flusher
+    with _lock:
+        if _flusher is not None:
+            return
+        _buffer = deque(maxlen=settings.SEARCH_QUERY_LOG_BUFFER_SIZE)
+        _flusher = threading.Thread(
+            target=_flush_forever, name="search-query-log", daemon=True
+        )
+        _flusher.start()
+        atexit.register(flush)
+
+
+def _flush_forever():
+    while True:
+        time.sleep(settings.SEARCH_QUERY_LOG_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            # The entries are lost, but there'll be more.
+            logger.exception("Could not flush the search query log")
+
+
+def flush():
+    """Write out everything in the buffer, and return how many entries that
+    was."""
+    entries = []
+    with _lock:
+        while _buffer:
+            entries.append(_buffer.popleft())
+    if not entries:
+        return 0
+    try:
+        _write(entries)
+    except Exception:
+        metrics.incr("querylog.dropped", len(entries))
+        raise
+    return len(entries)
+
+
+def _write(entries):
+    if settings.SEARCH_QUERY_LOG_FILE:
+        with open(settings.SEARCH_QUERY_LOG_FILE, "a") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in entries)
+    else:
+        pipeline = get_redis_connection("default").pipeline(transaction=False)
+        for entry in entries:
+            pipeline.xadd(
+                STREAM_KEY,
+                {"entry": json.dumps(entry)},
+                maxlen=settings.SEARCH_QUERY_LOG_STREAM_MAXLEN,
+                approximate=True,
+            )
+        pipeline.execute()
+
+
+def read(path=None):
+    """Return every entry logged so far, oldest first, from the file at
+    `path` (or `settings.SEARCH_QUERY_LOG_FILE`) or else the Redis stream."""
+    path = path or settings.SEARCH_QUERY_LOG_FILE
+    if path:
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    return [
+        json.loads(fields[b"entry"])
+        for _, fields in get_redis_connection("default").xrange(STREAM_KEY)
+    ]
@@ -0,0 +1,268 @@
+"""
+"Did you mean...?" suggestions from a spelling dictionary, rather than from
+Elasticsearch's term suggesters.
+
+The term suggesters are expensive, on the big `body` field, and what they
+come up with then has to be verified with another search. Instead, for each
+locale, the words of the titles, and the more common words of the bodies,
+of the current search index are counted, offline (see
+`build_dictionaries`), and stored in the cache. Each web worker then loads
+that, once per index generation and in the background, into a
+SymSpell-style dictionary, where every word is indexed by what's left of it
+with up to `MAX_DISTANCE` characters deleted. Correcting a word is then a
+matter of looking up what's left of it with characters deleted, without
+asking Elasticsearch anything.
+
+Until the dictionary for the current index generation has been built, and
+loaded, the term suggesters are used, as before. When Yari swaps the index
+over to a new generation, the periodic `build_spelling_dictionaries` Celery
+task builds its dictionaries, and the web workers let go of the old ones.
+"""
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from elasticsearch_dsl import Search
+
+from .caching import get_index_generation
+
+# Words are only corrected to words this few edits (insertions, deletions,
+# substitutions or transpositions) away.
+MAX_DISTANCE = 2
+
+# Just like the term suggesters (their `min_word_length` and
+# `prefix_length`), shorter words are never corrected, and words are only
+# corrected to words that start with the same letter. Otherwise, short words,
+# like "js" or "api", are only an edit or two away from some other common
+# word.
+MIN_WORD_LENGTH = 4
+SAME_PREFIX_LENGTH = 1
+
+# Only the start of each word is indexed. Enough to find the candidates,
+# without the index growing huge for long words.
+PREFIX_LENGTH = 7
+
+# How long a dictionary, for a index generation, is kept in the cache.
+TIMEOUT = 60 * 60 * 24 * 7
+
+# How often, at most, a web worker checks if the dictionary, that wasn't
+# there, has been built since.
+RECHECK_INTERVAL = 60
+
+# Only words made of letters are counted, or corrected.
+WORD_RE = re.compile(r"[^\W\d_]{2,}")
+
+
+def _make_key(generation, locale):
+    return f"search:spelling:{generation}:{locale}"
+
+
+def _deletes(word, max_distance=MAX_DISTANCE):
+    """Return everything that's left of the word with 1 up to `max_distance`
+    characters deleted."""
+    deletes = set()
+    edits = [word]
+    for _ in range(max_distance):
+        next_edits = []
+        for edit in edits:
+            if len(edit) <= 1:
+                continue
+            for i in range(len(edit)):
+                delete = edit[:i] + edit[i + 1 :]
+                if delete not in deletes:
+                    deletes.add(delete)
+                    next_edits.append(delete)
+        edits = next_edits
+    return deletes
+
+
+def _distance(a, b, max_distance=MAX_DISTANCE):
+    """Return the (optimal string alignment) edit distance between `a` and
+    `b`, or anything more than `max_distance` once it's clear it's more."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, y in enumerate(b, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (x != y),
+            )
+            if i > 1 and j > 1 and x == b[j - 2] and a[i - 2] == y:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class SpellingDictionary:
+    def __init__(self, frequencies):
+        # How many documents each word appears in.
+        self.frequencies = frequencies
+        self.index = defaultdict(list)
+        for word in frequencies:
+            prefix = word[:PREFIX_LENGTH]
+            self.index[prefix].append(word)
+            for delete in _deletes(prefix):
+                self.index[delete].append(word)
+
+    def correct(self, word):
+        """Return the most likely correct spelling of the word, or None if it
+        isn't misspelled or there's nothing close enough to it."""
+        if len(word) < MIN_WORD_LENGTH or word in self.frequencies:
+            return None
+        prefix = word[:PREFIX_LENGTH]
+        candidates = set(self.index.get(prefix, ()))
+        for delete in _deletes(prefix):
+            candidates.update(self.index.get(delete, ()))
+
+        best = None
+        for candidate in candidates:
+            if candidate[:SAME_PREFIX_LENGTH] != word[:SAME_PREFIX_LENGTH]:
+                continue
+            distance = _distance(word, candidate)
+            if distance > MAX_DISTANCE:
+                continue
+            # The fewer edits the better. Then, the more common the better.
+            rank = (distance, -self.frequencies[candidate], candidate)
+            if best is None or rank < best:
+                best = rank
+        return best and best[2]
+
+    def suggest(self, query_string):
+        """Return the query string with every misspelled word corrected, and
+        how many documents the most common of its words appear in. Or None if
+        there was nothing to correct."""
+        words = query_string.lower().split()
+        corrected = False
+        for i, word in enumerate(words):
+            if WORD_RE.fullmatch(word):
+                correction = self.correct(word)
+                if correction:
+                    words[i] = correction
+                    corrected = True
+        if not corrected:
+            return None
+        return " ".join(words), max(self.frequencies.get(x, 0) for x in words)
+
+
+_lock = threading.Lock()
+# The index generation the dictionaries are loaded for. Only ever one, so
+# that a web worker holds on to no more than a dictionary per locale.
+_generation = None
+# The key of the dictionary => (SpellingDictionary or None, when it was loaded)
+_loaded = {}
+# The key of the dictionary => the thread that's loading it
+_loading = {}
+
+
+def get_dictionary(locales, generation):
+    """Return the spelling dictionary for the index generation (see
+    `get_index_generation`), if it has been built and loaded. Only for
+    searches in exactly one locale.
+
+    Indexing every word of a dictionary, by what's left of it with some
+    characters deleted, takes a while (about a second for 20,000 words). So
+    that's never done while a search waits. The first search to ask for it
+    starts loading it in the background, and, until that's done, every
+    search gets None (and uses the term suggesters instead).
+
+    Once the index generation changes, the dictionaries of the previous one
+    are let go of, straight away.
+    """
+    global _generation
+    if not settings.SEARCH_SPELLING_DICTIONARIES or len(locales) != 1:
+        return None
+    key = _make_key(generation, locales[0])
+    loaded = _loaded.get(key)
+    if loaded and (
+        loaded[0] is not None or time.monotonic() - loaded[1] < RECHECK_INTERVAL
+    ):
+        return loaded[0]
+
+    with _lock:
+        if generation != _generation:
+            _generation = generation
+            _loaded.clear()
+        if key not in _loading:
+            _loading[key] = threading.Thread(
+                target=_load, args=(key, generation), daemon=True
+            )
+            _loading[key].start()
+    return None
+
+
+def _load(key, generation):
+    dictionary = None
+    try:
+        frequencies = cache.get(key)
+        if frequencies:
+            dictionary = SpellingDictionary(frequencies)
+    finally:
+        with _lock:
+            # Unless the index generation changed in the meantime.
+            if generation == _generation:
+                _loaded[key] = (dictionary, time.monotonic())
+            del _loading[key]
+
+
+def reset():
+    """Forget about every loaded dictionary."""
+    global _generation
+    with _lock:
+        _generation = None
+        _loaded.clear()
+
+
+def count_words(documents):
+    """Return, for each locale, how many documents each word appears in. All
+    the words of the titles are counted, but only the words that appear in
+    at least `settings.SEARCH_SPELLING_MIN_BODY_FREQUENCY` bodies."""
+    titles = defaultdict(Counter)
+    bodies = defaultdict(Counter)
+    for document in documents:
+        locale = document["locale"]
+        title_words = set(WORD_RE.findall((document.get("title") or "").lower()))
+        body_words = set(WORD_RE.findall((document.get("body") or "").lower()))
+        titles[locale].update(title_words)
+        bodies[locale].update(body_words - title_words)
+
+    frequencies = {}
+    for locale in titles.keys() | bodies.keys():
+        counts = titles[locale].copy()
+        for word, count in bodies[locale].items():
+            if word in counts or count >= settings.SEARCH_SPELLING_MIN_BODY_FREQUENCY:
+                counts[word] += count
+        frequencies[locale] = dict(
+            counts.most_common(settings.SEARCH_SPELLING_MAX_WORDS)
+        )
+    return frequencies
+
+
+def build_dictionaries(force=False):
+    """Count the words of the current search index and store them, for each
+    locale, for the web workers to load into their spelling dictionaries.
+    Unless that has already been done, for this index generation, and not
+    `force`. Returns the locales that were built."""
+    generation = get_index_generation()
+    built_key = _make_key(generation, "built")
+    if not force and cache.get(built_key):
+        return []
+
+    search_query = Search(index=settings.SEARCH_INDEX_NAME).source(
+        ["title", "body", "locale"]
+    )
+    frequencies = count_words(hit.to_dict() for hit in search_query.scan())
+    cache.set_many(
+        {_make_key(generation, locale): x for locale, x in frequencies.items()},
+        TIMEOUT,
+    )
+    cache.set(built_key, sorted(frequencies), TIMEOUT)
+    return sorted(frequencies)
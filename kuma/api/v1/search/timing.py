@@ -0,0 +1,109 @@
+"""
+Times each phase of a search, to find out where the time goes when search
+is slow.
+
+The phases (see `metrics.PHASES`) are sent back in a `Server-Timing` header,
+which the browsers' dev tools know how to show, and are added to the
+histograms in `kuma.api.v1.search.metrics` for the operators.
+
+The timings of the search currently being handled are kept in a context
+variable, so that they don't need to be passed around. Outside of a view
+decorated with `server_timing`, timing a phase does nothing.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from . import metrics
+
+PHASES = metrics.PHASES
+
+_current = ContextVar("search_timings", default=None)
+
+
+class Timings:
+    def __init__(self):
+        self.durations = {}
+        # How the results were obtained. See `caching.find_cached`.
+        self.cache = None
+
+    def add(self, phase, ms):
+        self.durations[phase] = self.durations.get(phase, 0) + ms
+
+    def header(self):
+        """Return the value of the `Server-Timing` header."""
+        entries = [
+            f"{phase};dur={ms:.1f}"
+            for phase, ms in sorted(
+                self.durations.items(), key=lambda item: PHASES.index(item[0])
+            )
+        ]
+        if self.cache:
+            entries.append(f'cache;desc="{self.cache}"')
+        return ", ".join(entries)
+
+
+@contextmanager
+def phase(name):
+    """Add how long the block takes to the named phase of the search."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - start) * 1000)
+
+
+def record(name, ms):
+    """Add `ms` milliseconds to the named phase of the search."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, ms)
+
+
+def record_cache(status):
+    timings = _current.get()
+    if timings is not None:
+        timings.cache = status
+
+
+def _finish(timings, response, start):
+    timings.add("total", (time.perf_counter() - start) * 1000)
+    response["Server-Timing"] = timings.header()
+    for name, ms in timings.durations.items():
+        metrics.observe(name, ms)
+
+
+def server_timing(view):
+    """Decorator that times the phases of the search the view handles."""
+
+    if asyncio.iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_inner(request, *args, **kwargs):
+            timings = Timings()
+            start = time.perf_counter()
+            token = _current.set(timings)
+            try:
+                response = await view(request, *args, **kwargs)
+            finally:
+                _current.reset(token)
+            _finish(timings, response, start)
+            return response
+
+        return async_inner
+
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        timings = Timings()
+        start = time.perf_counter()
+        token = _current.set(timings)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _current.reset(token)
+        _finish(timings, response, start)
+        return response
+
+    return inner
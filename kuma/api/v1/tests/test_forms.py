@@ -1,5 +1,6 @@
 from django.test import RequestFactory
 
+from kuma.api.v1.search.cursors import encode_cursor
 from kuma.api.v1.search.forms import SearchForm
 
 
@@ -55,3 +56,57 @@ def test_search_form_locale_validation_error():
     form = SearchForm(request.GET, initial=initial)
     assert not form.is_valid()
     assert form.errors["locale"]
+
+
+def test_search_form_cursor():
+    initial = {"page": 1, "size": 10}
+    cursor = encode_cursor("popularity", [12.3, 4.5, "/en-us/docs/Foo"])
+    request = RequestFactory().get(
+        "/api/v1/search", {"q": "foo", "sort": "popularity", "cursor": cursor}
+    )
+    form = SearchForm(request.GET, initial=initial)
+    assert form.is_valid()
+    assert form.cleaned_data["cursor"] == (
+        "popularity",
+        [12.3, 4.5, "/en-us/docs/Foo"],
+    )
+
+    request = RequestFactory().get("/api/v1/search?q=foo&cursor=")
+    form = SearchForm(request.GET, initial=initial)
+    assert form.is_valid()
+    assert form.cleaned_data["cursor"] is None
+
+    # Garbage
+    request = RequestFactory().get("/api/v1/search?q=foo&cursor=xxx")
+    form = SearchForm(request.GET, initial=initial)
+    assert not form.is_valid()
+    assert form.errors["cursor"]
+
+    # Well-formed, but not sort values
+    for after in (
+        [],
+        [12.3, "/en-us/docs/Foo"],
+        [12.3, 4.5, "/en-us/docs/Foo", 1],
+        [12.3, {"a": 1}, "/en-us/docs/Foo"],
+        [[12.3], 4.5, "/en-us/docs/Foo"],
+        [True, 4.5, "/en-us/docs/Foo"],
+    ):
+        request = RequestFactory().get(
+            "/api/v1/search",
+            {
+                "q": "foo",
+                "sort": "popularity",
+                "cursor": encode_cursor("popularity", after),
+            },
+        )
+        form = SearchForm(request.GET, initial=initial)
+        assert not form.is_valid()
+        assert form.errors["cursor"]
+
+    # A cursor from a search with a different sort
+    request = RequestFactory().get(
+        "/api/v1/search", {"q": "foo", "sort": "relevance", "cursor": cursor}
+    )
+    form = SearchForm(request.GET, initial=initial)
+    assert not form.is_valid()
+    assert form.errors["cursor"]
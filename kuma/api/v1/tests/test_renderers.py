@@ -0,0 +1,72 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+import pytest
+from django.core.serializers.json import DjangoJSONEncoder
+from ninja.responses import NinjaJSONEncoder
+
+from kuma.api.v1 import renderers
+from kuma.api.v1.smarter_schema import Schema
+
+
+class Thing(Schema):
+    id: uuid.UUID
+    created: datetime.datetime
+
+
+DATA = {
+    "id": uuid.UUID("6f2c4fa2-3b1e-4c36-9a4c-b6f3bbb1f3a9"),
+    "created": datetime.datetime(
+        2022, 3, 1, 12, 30, 45, 123456, tzinfo=datetime.timezone.utc
+    ),
+    "day": datetime.date(2022, 3, 1),
+    "price": Decimal("4.99"),
+    "title": "<mark>Flex</mark> – ünïcode",
+    "things": [
+        Thing(
+            id=uuid.UUID("00000000-0000-0000-0000-000000000001"),
+            created=datetime.datetime(2022, 3, 1, 0, 0, 0, 999999),
+        )
+    ],
+    1: "non-string key",
+}
+
+
+@pytest.mark.parametrize("use_orjson", [False, True])
+def test_dumps_same_as_django(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(renderers, "orjson", None)
+    rendered = renderers.dumps(DATA, encoder=NinjaJSONEncoder)
+    assert isinstance(rendered, bytes)
+    assert json.loads(rendered) == json.loads(json.dumps(DATA, cls=NinjaJSONEncoder))
+    data = json.loads(rendered)
+    # Just like DjangoJSONEncoder, datetimes only go down to milliseconds.
+    assert data["created"] == "2022-03-01T12:30:45.123Z"
+    assert data["things"][0]["created"] == "2022-03-01T00:00:00.999"
+
+    with pytest.raises(TypeError):
+        renderers.dumps({"unknown": object()}, encoder=DjangoJSONEncoder)
+
+
+def test_dumps_non_ascii(monkeypatch):
+    pytest.importorskip("orjson")
+    data = {"title": "Flex – ünïcode"}
+    rendered = renderers.dumps(data)
+    # Written as UTF-8, rather than escaped...
+    assert "ünïcode".encode("utf-8") in rendered
+    monkeypatch.setattr(renderers, "orjson", None)
+    escaped = renderers.dumps(data)
+    assert b"\\u00fcn\\u00efcode" in escaped
+    # ...but the same JSON.
+    assert json.loads(rendered) == json.loads(escaped) == data
+
+
+def test_ninja_api_renderer(user_client):
+    response = user_client.get("/api/v1/whoami")
+    assert response.status_code == 200
+    assert response["content-type"] == "application/json; charset=utf-8"
+    assert "is_authenticated" in response.json()
@@ -1,8 +1,41 @@
-from unittest.mock import patch
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from io import StringIO
+from unittest.mock import MagicMock, patch
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.management import call_command
 from elasticmock import FakeElasticsearch
+from elasticmock.fake_indices import FakeIndicesClient
+from elasticsearch import exceptions
+from elasticsearch.client.utils import query_params
+from elasticsearch_dsl.connections import connections
 
+from kuma.api.v1.search import (
+    FILTER_PATH,
+    SOURCE_FIELDS,
+    _page_search,
+    _unpack_response,
+    async_search,
+    hedging,
+    load,
+    metrics,
+    querylog,
+    spelling,
+)
+from kuma.api.v1.search.breaker import breaker
+from kuma.api.v1.search.caching import (
+    INDEX_GENERATION_KEY,
+    get_index_generation,
+    make_key,
+)
+from kuma.api.v1.search.cursors import encode_cursor
 from kuma.core.urlresolvers import reverse
 
 
@@ -48,12 +81,31 @@ def test_search_validation_problems(user_client, settings):
     assert response.status_code == 400
     assert response.json()["errors"]["slug_prefix"][0]["code"] == "invalid_choice"
 
+    # 'cursor' decodes, but doesn't hold sort values
+    cursor = encode_cursor("best", [{"script": "x"}, 1, "/en-us/docs/Foo"])
+    response = user_client.get(url, {"q": "x", "cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["errors"]["cursor"][0]["code"] == "invalid"
+
+
+class AliasingFakeIndicesClient(FakeIndicesClient):
+    @query_params()
+    def get_alias(self, index=None, name=None, params=None, headers=None):
+        # Pretend that the index name is an alias for a concrete index.
+        return {f"{index}_20220301": {"aliases": {index: {}}}}
+
 
 class FindEverythingFakeElasticsearch(FakeElasticsearch):
+    @property
+    def indices(self):
+        return AliasingFakeIndicesClient(self)
+
     def search(self, *args, **kwargs):
         # This trick is what makes the mock so basic. It basically removes
         # any search query so that it just returns EVERYTHING that's been indexed.
         kwargs.pop("body", None)
+        # ElasticMock doesn't know about this one.
+        kwargs.pop("track_total_hits", None)
         result = super().search(*args, **kwargs)
         # Due to a bug in ElasticMock, instead of returning an object for the
         # `response.hits.total`, it returns just an integer. We'll need to fix that.
@@ -65,12 +117,31 @@ class FindEverythingFakeElasticsearch(FakeElasticsearch):
         return result
 
 
+def index_foo(fake_elasticsearch, index):
+    fake_elasticsearch.index(
+        index,
+        {
+            "id": "/en-us/docs/Foo",
+            "title": "Foo Title",
+            "summary": "Foo summary",
+            "locale": "en-us",
+            "slug": "Foo",
+            "popularity": 0,
+        },
+        id="/en-us/docs/Foo",
+    )
+
+
 @pytest.fixture
 def mock_elasticsearch():
     fake_elasticsearch = FindEverythingFakeElasticsearch()
-    with patch("elasticsearch_dsl.search.get_connection") as get_connection:
-        get_connection.return_value = fake_elasticsearch
-        yield fake_elasticsearch
+    connections.add_connection("default", fake_elasticsearch)
+    try:
+        with patch("elasticsearch_dsl.search.get_connection") as get_connection:
+            get_connection.return_value = fake_elasticsearch
+            yield fake_elasticsearch
+    finally:
+        connections.remove_connection("default")
 
 
 def test_search_basic_match(user_client, settings, mock_elasticsearch):
@@ -114,3 +185,964 @@ def test_search_basic_match(user_client, settings, mock_elasticsearch):
             "summary": "Foo summary",
         }
     ]
+
+
+def test_search_lean_response(user_client, settings, mock_elasticsearch):
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    with patch.object(
+        mock_elasticsearch, "search", wraps=mock_elasticsearch.search
+    ) as search:
+        response = user_client.get(url, {"q": "foo"})
+    assert response.status_code == 200
+    kwargs = search.call_args.kwargs
+    assert kwargs["body"]["_source"] == {"includes": SOURCE_FIELDS}
+    assert kwargs["filter_path"] == FILTER_PATH
+
+    # With the `filter_path`, when nothing is found, there are no hits at all.
+    params = {"size": 10, "page": 1, "sort": None}
+    results = _unpack_response(
+        params, {"took": 1, "hits": {"total": {"value": 0, "relation": "eq"}}}
+    )
+    assert results["documents"] == []
+    assert results["metadata"]["total"] == {"value": 0, "relation": "eq"}
+
+
+def test_search_partial_results(user_client, settings, mock_elasticsearch):
+    settings.SEARCH_TRACK_TOTAL_HITS = 1000
+    settings.SEARCH_SHARD_TIMEOUT = "500ms"
+    settings.SEARCH_TERMINATE_AFTER = 50000
+    # Only the searches coalesced with it would get the partial results.
+    settings.SEARCH_COALESCE_TIMEOUT = 0
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    search = mock_elasticsearch.search
+
+    def timing_out_search(*args, **kwargs):
+        return dict(search(*args, **kwargs), timed_out=True)
+
+    url = reverse("api.v1.search")
+    with patch.object(
+        mock_elasticsearch, "search", side_effect=timing_out_search
+    ) as search_mock:
+        response = user_client.get(url, {"q": "foo"})
+        assert response.status_code == 200
+        kwargs = search_mock.call_args.kwargs
+        assert kwargs["track_total_hits"] == 1000
+        assert kwargs["timeout"] == "500ms"
+        assert kwargs["terminate_after"] == 50000
+        data = response.json()
+        # What was found in time is still worth showing.
+        assert data["metadata"]["partial"] is True
+        assert data["documents"][0]["mdn_url"] == "/en-us/docs/Foo"
+        assert "ETag" not in response
+
+        # But not worth holding on to. Neither here, nor in the CDN.
+        assert "max-age=10" in response["Cache-Control"]
+        response = user_client.get(url, {"q": "foo"})
+        assert search_mock.call_count == 2
+
+
+def test_search_query_log(user_client, settings, mock_elasticsearch, tmp_path):
+    settings.SEARCH_QUERY_LOG_SAMPLE_RATE = 1
+    settings.SEARCH_QUERY_LOG_FILE = str(tmp_path / "queries.jsonl")
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    querylog.flush()
+    for query_string in ("foo", "Foo", "bar"):
+        response = user_client.get(url, {"q": query_string}, follow=True)
+        assert response.status_code == 200
+    # Nothing's written until the buffer is flushed.
+    assert not (tmp_path / "queries.jsonl").exists()
+    assert querylog.flush() == 3
+
+    entries = querylog.read()
+    assert [x["query"] for x in entries] == ["foo", "foo", "bar"]
+    assert [x["cache"] for x in entries] == ["miss", "hit", "miss"]
+    assert entries[0]["locales"] == ["en-us"]
+    assert entries[0]["total"] == 1
+
+    out = StringIO()
+    call_command("search_query_log", stdout=out)
+    output = out.getvalue()
+    assert "3 searches logged" in output
+    most_frequent, slowest = output.split("Slowest:")
+    assert most_frequent.index("foo") < most_frequent.index("bar")
+
+
+def test_search_query_log_dropped(
+    user_client, settings, mock_elasticsearch, tmp_path, monkeypatch
+):
+    settings.SEARCH_QUERY_LOG_SAMPLE_RATE = 1
+    # There's no such directory to write to.
+    settings.SEARCH_QUERY_LOG_FILE = str(tmp_path / "missing" / "queries.jsonl")
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    flush = querylog.flush
+    # Keep the background thread, if any, out of it.
+    monkeypatch.setattr(querylog, "flush", lambda: 0)
+    monkeypatch.setattr(querylog, "_flusher", threading.current_thread())
+    monkeypatch.setattr(querylog, "_buffer", deque(maxlen=2))
+    for query_string in ("foo", "bar", "baz"):
+        response = user_client.get(url, {"q": query_string})
+        assert response.status_code == 200
+    assert metrics.snapshot()["querylog.dropped"] == 1
+
+    with pytest.raises(FileNotFoundError):
+        flush()
+    assert metrics.snapshot()["querylog.dropped"] == 3
+
+
+class SuggestingFakeElasticsearch(FindEverythingFakeElasticsearch):
+    """Pretends that 'fooo' is a typo. The suggesters offer two alternative
+    spellings, but only one of them matches any indexed documents."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.msearch_bodies = []
+
+    def search(self, *args, **kwargs):
+        body = kwargs.get("body") or {}
+        result = super().search(*args, **kwargs)
+        if "suggest" in body:
+            options = [
+                {"text": "fox", "score": 0.9, "freq": 1},
+                {"text": "foo", "score": 0.8, "freq": 1},
+            ]
+            result["suggest"] = {
+                "title_suggestions": [
+                    {"text": "fooo", "offset": 0, "length": 4, "options": options}
+                ],
+                "body_suggestions": [
+                    {"text": "fooo", "offset": 0, "length": 4, "options": options}
+                ],
+            }
+        return result
+
+    def msearch(self, body, *args, **kwargs):
+        self.msearch_bodies.append(body)
+        result = super().msearch(body, *args, **kwargs)
+        for query, response in zip(body[1::2], result["responses"]):
+            if "fox" in str(query):
+                response["hits"]["total"] = {"value": 0, "relation": "eq"}
+        return result
+
+
+def test_search_suggestions_verified_in_one_round_trip(
+    user_client, settings, mock_elasticsearch
+):
+    fake_elasticsearch = SuggestingFakeElasticsearch()
+    index_foo(fake_elasticsearch, settings.SEARCH_INDEX_NAME)
+    with patch("elasticsearch_dsl.search.get_connection") as get_connection:
+        get_connection.return_value = fake_elasticsearch
+        response = user_client.get(reverse("api.v1.search"), {"q": "fooo"})
+    assert response.status_code == 200
+    # Both suggesters came up with the same two candidates, but they're only
+    # counted once, and in a single multi-search.
+    (body,) = fake_elasticsearch.msearch_bodies
+    assert len(body) == 2 * 2
+    for query in body[1::2]:
+        assert query["size"] == 0
+        assert "highlight" not in query
+        assert "suggest" not in query
+    assert response.json()["suggestions"] == [
+        {"text": "foo", "total": {"value": 1, "relation": "eq"}}
+    ]
+
+
+def wait_for_dictionaries():
+    """Wait until the spelling dictionaries being loaded have been."""
+    for thread in list(spelling._loading.values()):
+        thread.join()
+
+
+def test_search_suggestions_from_spelling_dictionary(
+    user_client, settings, mock_elasticsearch
+):
+    settings.SEARCH_RESULTS_CACHE_TIMEOUT = 0
+    fake_elasticsearch = SuggestingFakeElasticsearch()
+    index_foo(fake_elasticsearch, settings.SEARCH_INDEX_NAME)
+    searches = []
+    search = fake_elasticsearch.search
+
+    def recording_search(*args, **kwargs):
+        searches.append(kwargs.get("body") or {})
+        return search(*args, **kwargs)
+
+    fake_elasticsearch.search = recording_search
+    spelling.reset()
+    with patch("elasticsearch_dsl.search.get_connection") as get_connection:
+        get_connection.return_value = fake_elasticsearch
+        caches["default"].set(
+            spelling._make_key(get_index_generation(), "en-us"),
+            {"foo": 7, "fox": 1},
+        )
+        try:
+            # Until the dictionary has been loaded, the suggesters are used.
+            response = user_client.get(reverse("api.v1.search"), {"q": "fooo"})
+            assert response.status_code == 200
+            assert "suggest" in searches.pop(0)
+            searches.clear()
+            fake_elasticsearch.msearch_bodies.clear()
+            wait_for_dictionaries()
+            response = user_client.get(reverse("api.v1.search"), {"q": "fooo"})
+            # The dictionary can't tell how many documents its suggestions
+            # find in only some slugs. So the suggesters are asked instead.
+            slug_response = user_client.get(
+                reverse("api.v1.search"), {"q": "fooo", "slug_prefix": "foo"}
+            )
+        finally:
+            spelling.reset()
+    assert response.status_code == 200
+    # Neither the suggesters, nor verifying what they come up with, needed.
+    body, slug_body = searches[:2]
+    assert "suggest" not in body
+    assert response.json()["suggestions"] == [
+        {"text": "foo", "total": {"value": 7, "relation": "gte"}}
+    ]
+    assert slug_response.status_code == 200
+    assert "suggest" in slug_body
+    assert fake_elasticsearch.msearch_bodies
+
+
+class AsyncFakeElasticsearch:
+    """Pretends to be an `AsyncElasticsearch` by awaiting a sync fake."""
+
+    def __init__(self, fake_elasticsearch):
+        self.fake_elasticsearch = fake_elasticsearch
+
+    async def search(self, **kwargs):
+        return self.fake_elasticsearch.search(**kwargs)
+
+    async def msearch(self, **kwargs):
+        return self.fake_elasticsearch.msearch(**kwargs)
+
+
+def test_async_search(rf, user_client, settings, mock_elasticsearch):
+    settings.SEARCH_RESULTS_CACHE_TIMEOUT = 0
+    fake_elasticsearch = SuggestingFakeElasticsearch()
+    index_foo(fake_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    request = rf.get(url, {"q": "fooo"})
+    with patch.object(async_search, "get_client") as get_client:
+        get_client.return_value = AsyncFakeElasticsearch(fake_elasticsearch)
+        response = async_to_sync(async_search.search)(request)
+    assert response.status_code == 200
+    assert "public" in response["Cache-Control"]
+    assert response["Access-Control-Allow-Origin"] == "*"
+    assert "suggest;dur=" in response["Server-Timing"]
+    data = json.loads(response.content)
+    assert data["suggestions"] == [
+        {"text": "foo", "total": {"value": 1, "relation": "eq"}}
+    ]
+    (body,) = fake_elasticsearch.msearch_bodies
+    assert len(body) == 2 * 2
+
+    # It finds exactly what the sync view finds.
+    with patch("elasticsearch_dsl.search.get_connection") as get_connection:
+        get_connection.return_value = fake_elasticsearch
+        sync_data = user_client.get(url, {"q": "fooo"}).json()
+    del data["metadata"]["took_ms"]
+    del sync_data["metadata"]["took_ms"]
+    assert data == sync_data
+
+
+def test_async_search_client_per_event_loop(settings):
+    async def get_client():
+        return async_search.get_client()
+
+    async def get_clients():
+        return async_search.get_client(), async_search.get_client()
+
+    with patch("elasticsearch.AsyncElasticsearch", create=True) as client_class:
+        client_class.side_effect = lambda **kwargs: object()
+        first, same = asyncio.run(get_clients())
+        other = asyncio.run(get_client())
+    assert first is same
+    # The first event loop is closed, and its client is no use to another.
+    assert other is not first
+    client_class.assert_called_with(hosts=settings.ES_URLS)
+
+
+def test_search_server_timing(user_client, settings, mock_elasticsearch):
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    response = user_client.get(url, {"q": "foo"})
+    assert response.status_code == 200
+    phases = [x.split(";")[0] for x in response["Server-Timing"].split(", ")]
+    assert phases == [
+        "validate",
+        "build",
+        "es",
+        "took",
+        "suggest",
+        "unpack",
+        "render",
+        "total",
+        "cache",
+    ]
+    assert 'cache;desc="miss"' in response["Server-Timing"]
+
+    response = user_client.get(url, {"q": "foo"})
+    phases = [x.split(";")[0] for x in response["Server-Timing"].split(", ")]
+    assert phases == ["validate", "render", "total", "cache"]
+    assert 'cache;desc="hit"' in response["Server-Timing"]
+
+    timings = metrics.timings()
+    assert timings["total"]["count"] == 2
+    assert timings["total"]["buckets"]["+Inf"] == 2
+    assert timings["es"]["count"] == 1
+    assert timings["took"]["sum_ms"] == response.json()["metadata"]["took_ms"]
+
+
+def test_search_timing_histograms():
+    metrics.observe("es", 0.5)
+    metrics.observe("es", 7)
+    metrics.observe("es", 12000)
+    histogram = metrics.timings()["es"]
+    assert histogram["count"] == 3
+    assert histogram["sum_ms"] == 12007.5
+    assert histogram["buckets"]["1"] == 1
+    assert histogram["buckets"]["5"] == 1
+    assert histogram["buckets"]["10"] == 2
+    assert histogram["buckets"]["5000"] == 2
+    assert histogram["buckets"]["+Inf"] == 3
+
+
+def test_search_metrics_flushed_in_background(settings, monkeypatch):
+    settings.SEARCH_METRICS_FLUSH_INTERVAL = 10
+    started = []
+    monkeypatch.setattr(metrics, "_start", lambda: started.append(True))
+    metrics.incr("hedge.sent")
+    metrics.observe("es", 7)
+    # Nothing's been added to the shared counters on the way.
+    assert started
+    assert metrics.snapshot()["hedge.sent"] == 0
+    assert metrics.timings()["es"]["count"] == 0
+
+    metrics.flush()
+    assert metrics.snapshot()["hedge.sent"] == 1
+    assert metrics.timings()["es"]["count"] == 1
+
+
+@pytest.mark.parametrize(
+    "query_string,canonical",
+    [
+        ("q=Flex&locale=en-US", "q=flex"),
+        ("locale=en-us&q=flex+", "q=flex"),
+        ("q=flex&size=10&page=1&sort=best", "q=flex"),
+        ("q=flex&utm_source=x", "q=flex"),
+        ("q=%20Flex%20%20Box", "q=flex+box"),
+        (
+            "sort=popularity&q=flex&locale=fr&locale=en-US",
+            "locale=en-us&locale=fr&q=flex&sort=popularity",
+        ),
+        (
+            "q=flex&slug_prefix=Web/CSS&slug_prefix=web/api",
+            "q=flex&slug_prefix=web%2Fapi&slug_prefix=web%2Fcss",
+        ),
+    ],
+)
+def test_search_canonical_redirect(
+    client, settings, mock_elasticsearch, query_string, canonical
+):
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    response = client.get(f"{url}?{query_string}")
+    assert response.status_code == 301
+    assert response["Location"] == f"{url}?{canonical}"
+    assert "public" in response["Cache-Control"]
+    assert response["Access-Control-Allow-Origin"] == "*"
+    with patch.object(
+        mock_elasticsearch, "search", wraps=mock_elasticsearch.search
+    ) as search:
+        response = client.get(response["Location"])
+    assert response.status_code == 200
+    assert search.call_count == 1
+
+
+def test_search_canonical_redirect_legacy(client, settings, mock_elasticsearch):
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search_legacy", kwargs={"locale": "fr"})
+    response = client.get(f"{url}?q=flex&locale=fr")
+    assert response.status_code == 301
+    assert response["Location"] == f"{url}?q=flex"
+    response = client.get(response["Location"])
+    assert response.status_code == 200
+
+
+def test_search_conditional_get(user_client, settings, mock_elasticsearch):
+    settings.SEARCH_RESULTS_CACHE_TIMEOUT = 0
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    with patch.object(
+        mock_elasticsearch, "search", wraps=mock_elasticsearch.search
+    ) as search:
+        response = user_client.get(url, {"q": "foo"})
+        assert response.status_code == 200
+        etag = response["ETag"]
+        # The results aren't the same byte for byte (took_ms, for one).
+        assert etag.startswith('W/"')
+        assert search.call_count == 1
+
+        response = user_client.get(url, {"q": "foo"}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+        assert "public" in response["Cache-Control"]
+        assert search.call_count == 1
+
+        # Only a 304 is short-circuited. Not the 412 of an If-Match that
+        # doesn't match.
+        response = user_client.get(url, {"q": "foo"}, HTTP_IF_MATCH='"nope"')
+        assert response.status_code == 200
+        assert response["ETag"] == etag
+        assert search.call_count == 2
+
+        # A different search has different results.
+        response = user_client.get(
+            url, {"page": 2, "q": "foo"}, HTTP_IF_NONE_MATCH=etag
+        )
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+        assert search.call_count == 3
+
+        # And so does the same search, once the index has been swapped.
+        caches["default"].set(INDEX_GENERATION_KEY, "mdn_docs_20220401")
+        response = user_client.get(url, {"q": "foo"}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+        assert search.call_count == 4
+
+
+def test_search_results_cached(user_client, settings, mock_elasticsearch):
+    # Even if the CDN isn't told about the canonical URLs.
+    settings.SEARCH_CANONICAL_REDIRECTS = False
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    with patch.object(
+        mock_elasticsearch, "search", wraps=mock_elasticsearch.search
+    ) as search:
+        response = user_client.get(url, {"q": "foo"})
+        assert response.status_code == 200
+        assert search.call_count == 1
+        # Same search, just spelled differently.
+        response = user_client.get(url, {"q": "Foo ", "locale": "en-US"})
+        assert response.status_code == 200
+        assert search.call_count == 1
+        assert response.json()["documents"][0]["mdn_url"] == "/en-us/docs/Foo"
+        # Different search.
+        response = user_client.get(url, {"q": "foo", "page": 2})
+        assert response.status_code == 200
+        assert search.call_count == 2
+
+    counters = metrics.snapshot()
+    assert counters["cache.hit"] == 1
+    assert counters["cache.miss"] == 2
+
+
+def test_search_results_cache_follows_index_generation(
+    user_client, settings, mock_elasticsearch
+):
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    with patch.object(
+        mock_elasticsearch, "search", wraps=mock_elasticsearch.search
+    ) as search:
+        assert user_client.get(url, {"q": "foo"}).status_code == 200
+        assert search.call_count == 1
+        assert user_client.get(url, {"q": "foo"}).status_code == 200
+        assert search.call_count == 1
+        # Yari re-indexed and the alias now points to a fresh index.
+        caches["default"].set(INDEX_GENERATION_KEY, "mdn_docs_20220302")
+        assert user_client.get(url, {"q": "foo"}).status_code == 200
+        assert search.call_count == 2
+
+
+def test_search_index_generation_unknown(user_client, settings, mock_elasticsearch):
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    outage = exceptions.ConnectionError("N/A", "Connection refused", None)
+    with patch.object(
+        AliasingFakeIndicesClient, "get_alias", side_effect=outage
+    ) as get_alias:
+        response = user_client.get(url, {"q": "foo"})
+        assert response.status_code == 200
+        # Without knowing the index, there's no telling when it changes.
+        assert "etag" not in response
+        (call,) = get_alias.call_args_list
+        assert (
+            call.kwargs["request_timeout"]
+            == settings.SEARCH_INDEX_GENERATION_REQUEST_TIMEOUT
+        )
+        # Not knowing is remembered, for a little while.
+        assert user_client.get(url, {"q": "foo"}).status_code == 200
+        assert get_alias.call_count == 1
+    # And it counts as a failure, as far as the circuit breaker is concerned.
+    assert caches["default"].get(breaker.failures_key) == 1
+
+
+def test_search_index_generation_circuit_open(
+    user_client, settings, mock_elasticsearch
+):
+    settings.SEARCH_BREAKER_RESET_TIMEOUT = 60
+    caches["default"].set(breaker.opened_key, time.time(), timeout=None)
+    url = reverse("api.v1.search")
+    with patch.object(AliasingFakeIndicesClient, "get_alias") as get_alias:
+        response = user_client.get(url, {"q": "foo"})
+    assert response.status_code == 503
+    get_alias.assert_not_called()
+
+
+def test_search_results_cache_disabled(user_client, settings, mock_elasticsearch):
+    settings.SEARCH_RESULTS_CACHE_TIMEOUT = 0
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    with patch.object(
+        mock_elasticsearch, "search", wraps=mock_elasticsearch.search
+    ) as search:
+        assert user_client.get(url, {"q": "foo"}).status_code == 200
+        assert user_client.get(url, {"q": "foo"}).status_code == 200
+        assert search.call_count == 2
+
+
+def test_search_coalesced_with_identical_search(
+    user_client, settings, mock_elasticsearch
+):
+    settings.SEARCH_COALESCE_POLL_INTERVAL = 0.01
+    params = {
+        "query": "foo",
+        "locales": ["en-us"],
+        "slug_prefixes": [],
+        "size": 10,
+        "page": 1,
+        "sort": None,
+        "cursor": None,
+    }
+    key = make_key(
+        params, get_index_generation(), make_suggestions=True, degradation_level=0
+    )
+    # Another request is already running the exact same search...
+    caches["default"].add(f"{key}:lock", 1)
+
+    def finish_leader(seconds):
+        # The leader finishes while this request is waiting for it. Doing
+        # that from a thread, after a fixed delay, could just as well finish
+        # before this request even got to look in the cache.
+        caches["default"].set(key, {"documents": [], "metadata": {}, "suggestions": []})
+        caches["default"].delete(f"{key}:lock")
+
+    with patch.object(mock_elasticsearch, "search") as search, patch(
+        "kuma.api.v1.search.caching.time.sleep", side_effect=finish_leader
+    ):
+        response = user_client.get(reverse("api.v1.search"), {"q": "foo"})
+    assert response.status_code == 200
+    assert response.json()["documents"] == []
+    # ...so this one just waited for its results.
+    search.assert_not_called()
+    assert metrics.snapshot()["coalesce.wait"] == 1
+
+
+def test_search_coalescing_times_out(user_client, settings, mock_elasticsearch):
+    settings.SEARCH_COALESCE_TIMEOUT = 0.05
+    settings.SEARCH_COALESCE_POLL_INTERVAL = 0.01
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    params = {
+        "query": "foo",
+        "locales": ["en-us"],
+        "slug_prefixes": [],
+        "size": 10,
+        "page": 1,
+        "sort": None,
+        "cursor": None,
+    }
+    # Another request is running the same search, but it never finishes.
+    caches["default"].add(
+        f"{make_key(params, get_index_generation(), make_suggestions=True, degradation_level=0)}:lock",
+        1,
+    )
+    response = user_client.get(reverse("api.v1.search"), {"q": "foo"})
+    assert response.status_code == 200
+    assert response.json()["documents"][0]["mdn_url"] == "/en-us/docs/Foo"
+    assert metrics.snapshot()["coalesce.timeout"] == 1
+
+
+class SortingFakeElasticsearch(FindEverythingFakeElasticsearch):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.search_bodies = []
+
+    def search(self, *args, **kwargs):
+        self.search_bodies.append(kwargs.get("body"))
+        result = super().search(*args, **kwargs)
+        # Pretend that they're sorted by popularity, and then by their ID.
+        for hit in result["hits"]["hits"]:
+            hit["sort"] = [hit["_source"]["popularity"], 1.0, hit["_id"]]
+        return result
+
+
+def test_search_cursor(user_client, settings, mock_elasticsearch):
+    fake_elasticsearch = SortingFakeElasticsearch()
+    for i in range(2):
+        fake_elasticsearch.index(
+            settings.SEARCH_INDEX_NAME,
+            {
+                "id": f"/en-us/docs/Foo{i}",
+                "title": f"Foo Title {i}",
+                "summary": "Foo summary",
+                "locale": "en-us",
+                "slug": f"Foo{i}",
+                "popularity": 0.5,
+            },
+            id=f"/en-us/docs/Foo{i}",
+        )
+    url = reverse("api.v1.search")
+    with patch("elasticsearch_dsl.search.get_connection") as get_connection:
+        get_connection.return_value = fake_elasticsearch
+        response = user_client.get(url, {"q": "foo", "size": 2, "sort": "popularity"})
+        assert response.status_code == 200
+        next_cursor = response.json()["metadata"]["next_cursor"]
+        assert next_cursor
+        (body,) = fake_elasticsearch.search_bodies
+        assert body["sort"] == [{"popularity": {"order": "desc"}}, "_score", "_id"]
+        assert "search_after" not in body
+
+        response = user_client.get(
+            url,
+            {"cursor": next_cursor, "q": "foo", "size": 2, "sort": "popularity"},
+        )
+        assert response.status_code == 200
+        body = fake_elasticsearch.search_bodies[-1]
+        assert body["search_after"] == [0.5, 1.0, "/en-us/docs/Foo1"]
+        assert body["from"] == 0
+        assert body["size"] == 2
+
+        # Fewer hits than the size means there are no more.
+        response = user_client.get(url, {"q": "foo", "size": 3, "sort": "popularity"})
+        assert response.status_code == 200
+        assert response.json()["metadata"]["next_cursor"] is None
+
+
+@pytest.mark.parametrize("slug_hierarchy_field", ["", "slug.hierarchy"])
+@pytest.mark.parametrize("sort", [None, "best", "relevance", "popularity"])
+@pytest.mark.parametrize("query_string", ["foo", "foo bar"])
+def test_compiled_search_same_as_dsl(
+    settings, sort, query_string, slug_hierarchy_field
+):
+    settings.SEARCH_SLUG_HIERARCHY_FIELD = slug_hierarchy_field
+    for slug_prefixes, cursor, degradation_level, make_suggestions in itertools.product(
+        ([], ["web"], ["web/css", "web/html", "web/javascript"]),
+        (None, [1.0, 0.5, "/en-us/docs/Foo"]),
+        range(4),
+        (False, True),
+    ):
+        params = {
+            "query": query_string,
+            "locales": ["en-us", "fr"],
+            "slug_prefixes": slug_prefixes,
+            "size": 7,
+            "page": 3,
+            "sort": sort,
+            "cursor": cursor,
+        }
+        settings.SEARCH_COMPILED_QUERIES = True
+        compiled = _page_search(params, make_suggestions, degradation_level)
+        settings.SEARCH_COMPILED_QUERIES = False
+        built = _page_search(params, make_suggestions, degradation_level)
+        assert compiled.to_dict() == built.to_dict()
+
+
+@pytest.mark.parametrize("sort", ["best", "relevance"])
+def test_search_slug_prefix_filter(user_client, settings, mock_elasticsearch, sort):
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    params = {"q": "foo", "sort": sort, "slug_prefix": ["Web/API", "web/css/"]}
+    with patch.object(
+        mock_elasticsearch, "search", wraps=mock_elasticsearch.search
+    ) as search:
+        assert user_client.get(url, params, follow=True).status_code == 200
+        body = search.call_args.kwargs["body"]
+        assert {
+            "bool": {
+                "should": [
+                    {"prefix": {"slug": "web/api"}},
+                    {"prefix": {"slug": "web/css/"}},
+                ]
+            }
+        } in body["query"]["bool"]["filter"]
+        # They don't take part in the scoring.
+        scoring = {k: v for k, v in body["query"]["bool"].items() if k != "filter"}
+        assert "prefix" not in str(scoring)
+
+        settings.SEARCH_SLUG_HIERARCHY_FIELD = "slug.hierarchy"
+        response = user_client.get(url, dict(params, q="bar"), follow=True)
+        assert response.status_code == 200
+        body = search.call_args.kwargs["body"]
+        assert {"terms": {"slug.hierarchy": ["web/api", "web/css"]}} in body["query"][
+            "bool"
+        ]["filter"]
+        assert "prefix" not in str(body)
+
+
+def test_autocomplete(user_client, settings, mock_elasticsearch):
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search_autocomplete")
+    with patch.object(
+        mock_elasticsearch, "search", wraps=mock_elasticsearch.search
+    ) as search:
+        response = user_client.get(url, {"q": "fo", "locale": "en-US"})
+    assert response.status_code == 200
+    assert "public" in response["Cache-Control"]
+    assert "max-age=0" not in response["Cache-Control"]
+    assert response["Access-Control-Allow-Origin"] == "*"
+    assert response.json()["documents"] == [
+        {"mdn_url": "/en-us/docs/Foo", "title": "Foo Title", "locale": "en-us"}
+    ]
+
+    body = search.call_args.kwargs["body"]
+    assert body["query"]["bool"]["must"] == [
+        {
+            "multi_match": {
+                "query": "fo",
+                "type": "bool_prefix",
+                "fields": ["title", "title._2gram", "title._3gram"],
+            }
+        }
+    ]
+    assert body["query"]["bool"]["filter"] == [{"terms": {"locale": ["en-us"]}}]
+    assert body["_source"] == {"includes": ["title", "locale"]}
+    assert body["track_total_hits"] is False
+    assert "highlight" not in body
+    assert "suggest" not in body
+
+
+def test_autocomplete_validation_problems(user_client):
+    url = reverse("api.v1.search_autocomplete")
+    response = user_client.get(url)
+    assert response.status_code == 400
+    assert response.json()["errors"]["q"][0]["code"] == "required"
+    assert "cache-control" not in response
+
+    response = user_client.get(url, {"q": "x", "size": "21"})
+    assert response.status_code == 400
+    assert response.json()["errors"]["size"][0]["code"] == "max_value"
+
+
+def test_search_circuit_breaker(user_client, settings, mock_elasticsearch):
+    # Otherwise the test client re-raises the failed searches' exceptions
+    # on the following requests too.
+    settings.DEBUG_PROPAGATE_EXCEPTIONS = False
+    settings.SEARCH_BREAKER_FAILURE_THRESHOLD = 2
+    settings.SEARCH_BREAKER_RESET_TIMEOUT = 60
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    outage = exceptions.ConnectionError("N/A", "Connection refused", None)
+    with patch.object(mock_elasticsearch, "search", side_effect=outage) as search:
+        for q in ("foo", "bar"):
+            with pytest.raises(exceptions.ConnectionError):
+                user_client.get(url, {"q": q})
+        assert search.call_count == 2
+
+        # That's enough failures for the breaker to open.
+        response = user_client.get(url, {"q": "baz"})
+        assert response.status_code == 503
+        assert 0 < int(response["Retry-After"]) <= 60
+        assert "public" not in response.get("Cache-Control", "")
+        assert search.call_count == 2
+
+    # Some time later, one request gets to see if Elasticsearch is back.
+    opened_key = breaker.opened_key
+    caches["default"].set(opened_key, time.time() - 61, timeout=None)
+    response = user_client.get(url, {"q": "foo"})
+    assert response.status_code == 200
+    # It was, so the breaker is closed again.
+    assert caches["default"].get(opened_key) is None
+    counters = metrics.snapshot()
+    assert counters["breaker.opened"] == 1
+    assert counters["breaker.rejected"] == 1
+
+
+def test_search_circuit_breaker_probe_fails(user_client, settings, mock_elasticsearch):
+    settings.DEBUG_PROPAGATE_EXCEPTIONS = False
+    settings.SEARCH_BREAKER_RESET_TIMEOUT = 60
+    url = reverse("api.v1.search")
+    # Otherwise, looking up the index generation is the probe.
+    caches["default"].set(INDEX_GENERATION_KEY, "mdn_docs_20220301")
+    opened_key = breaker.opened_key
+    caches["default"].set(opened_key, time.time() - 61, timeout=None)
+    outage = exceptions.ConnectionError("N/A", "Connection refused", None)
+    with patch.object(mock_elasticsearch, "search", side_effect=outage):
+        with pytest.raises(exceptions.ConnectionError):
+            user_client.get(url, {"q": "foo"})
+    # Still broken, so it's open for another while.
+    assert caches["default"].get(opened_key) > time.time() - 1
+    assert user_client.get(url, {"q": "foo"}).status_code == 503
+
+
+def test_search_retries_within_deadline(user_client, settings, mock_elasticsearch):
+    settings.ES_RETRY_ATTEMPTS = 5
+    settings.ES_RETRY_SLEEPTIME = 0.1
+    settings.ES_RETRY_DEADLINE = 0.3
+    url = reverse("api.v1.search")
+    outage = exceptions.ConnectionError("N/A", "Connection refused", None)
+    with patch.object(mock_elasticsearch, "search", side_effect=outage) as search:
+        with pytest.raises(exceptions.ConnectionError):
+            user_client.get(url, {"q": "foo"})
+    # After sleeping 0.1 and then 0.15 seconds, sleeping another 0.225 seconds
+    # would blow the deadline, so there's no 4th attempt.
+    assert search.call_count == 3
+    for call in search.call_args_list:
+        assert 0 < call.kwargs["request_timeout"] <= 0.3
+
+
+def test_search_deadline_exceeded(rf, user_client, settings, mock_elasticsearch):
+    settings.ES_RETRY_DEADLINE = 0
+    settings.SEARCH_RESULTS_CACHE_TIMEOUT = 0
+    # Otherwise, looking up the index generation takes up the deadline.
+    caches["default"].set(INDEX_GENERATION_KEY, "mdn_docs_20220301")
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    with patch.object(async_search, "get_client") as get_client:
+        get_client.return_value = AsyncFakeElasticsearch(mock_elasticsearch)
+        responses = [
+            user_client.get(url, {"q": "foo"}),
+            user_client.get(reverse("api.v1.search_autocomplete"), {"q": "fo"}),
+            async_to_sync(async_search.search)(rf.get(url, {"q": "foo"})),
+        ]
+    for response in responses:
+        assert response.status_code == 503
+        assert response["Retry-After"] == "1"
+        assert "public" not in response.get("Cache-Control", "")
+
+
+class SlowNodeFakeElasticsearch(FindEverythingFakeElasticsearch):
+    """Pretends to be a node that's in the middle of a long GC pause."""
+
+    def __init__(self, release, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = release
+
+    def search(self, *args, **kwargs):
+        self.release.wait(5)
+        return super().search(*args, **kwargs)
+
+
+def test_search_hedged(user_client, settings, mock_elasticsearch):
+    settings.ES_URLS = ["slow:9200", "fast:9200"]
+    settings.SEARCH_HEDGE_PERCENTILE = 90
+    settings.SEARCH_HEDGE_MIN_DELAY = 10
+    settings.SEARCH_CANONICAL_REDIRECTS = False
+    settings.SEARCH_RESULTS_CACHE_TIMEOUT = 0
+    settings.SEARCH_COALESCE_TIMEOUT = 0
+    release = threading.Event()
+    slow = SlowNodeFakeElasticsearch(release)
+    index_foo(slow, settings.SEARCH_INDEX_NAME)
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    nodes = {
+        hedging.node_alias("slow:9200"): slow,
+        hedging.node_alias("fast:9200"): mock_elasticsearch,
+    }
+    url = reverse("api.v1.search")
+    hedging.reset()
+    try:
+        with patch("elasticsearch_dsl.search.get_connection") as get_connection:
+            get_connection.side_effect = nodes.get
+            # Not hedged until there's some idea what's slow.
+            for _ in range(hedging.MIN_SAMPLES):
+                hedging.record(1)
+            start = time.monotonic()
+            response = user_client.get(url, {"q": "foo"})
+            assert response.status_code == 200
+            assert response.json()["documents"][0]["mdn_url"] == "/en-us/docs/Foo"
+            assert time.monotonic() - start < 2
+            # How long the hedge took doesn't count towards the delay.
+            assert len(hedging._latencies) == hedging.MIN_SAMPLES
+    finally:
+        release.set()
+        hedging.reset()
+
+    counters = metrics.snapshot()
+    assert counters["hedge.eligible"] == 1
+    assert counters["hedge.sent"] == 1
+    assert counters["hedge.won"] == 1
+
+
+def test_search_hedging_saturated(settings):
+    settings.ES_URLS = ["one:9200", "two:9200"]
+    settings.SEARCH_HEDGE_PERCENTILE = 90
+    # Not enough workers for a search and its hedge.
+    settings.SEARCH_HEDGE_MAX_WORKERS = 1
+    search_query = MagicMock()
+    hedging.reset()
+    try:
+        assert (
+            hedging.execute(search_query)
+            is search_query.using.return_value.execute.return_value
+        )
+        search_query.using.assert_called_once_with(hedging.node_alias("one:9200"))
+        assert len(hedging._latencies) == 1
+    finally:
+        hedging.reset()
+
+    counters = metrics.snapshot()
+    assert counters["hedge.eligible"] == 1
+    assert counters["hedge.saturated"] == 1
+    assert counters["hedge.sent"] == 0
+
+
+def test_search_degradation_ladder(settings):
+    settings.SEARCH_DEGRADATION_THRESHOLDS = [100, 200, 400]
+    load.reset()
+    try:
+        assert load.degradation_level() == 0
+        for _ in range(20):
+            load.record(250)
+        assert load.degradation_level() == 2
+        for _ in range(20):
+            load.record(1000)
+        assert load.degradation_level() == 3
+        # Not quite cheap enough yet, to step back down.
+        for _ in range(20):
+            load.record(350)
+        assert load.degradation_level() == 3
+        for _ in range(20):
+            load.record(10)
+        assert load.degradation_level() == 0
+
+        for _ in range(20):
+            load.record(1000)
+        settings.SEARCH_DEGRADATION_THRESHOLDS = []
+        assert load.degradation_level() == 0
+    finally:
+        load.reset()
+
+
+def test_search_degraded(user_client, settings, mock_elasticsearch):
+    index_foo(mock_elasticsearch, settings.SEARCH_INDEX_NAME)
+    url = reverse("api.v1.search")
+    with patch.object(
+        mock_elasticsearch, "search", wraps=mock_elasticsearch.search
+    ) as search, patch.object(load, "degradation_level", return_value=3):
+        response = user_client.get(url, {"q": "foo bar"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["metadata"]["degradation_level"] == 3
+    assert data["documents"][0]["highlight"] == {"body": [], "title": []}
+    # Not to be held on to for long after the pressure's gone.
+    assert "ETag" not in response
+    assert "max-age=60" in response["Cache-Control"]
+
+    body = search.call_args.kwargs["body"]
+    assert "suggest" not in body
+    assert "highlight" not in body
+    assert "match_phrase" not in str(body["query"])
+
+    # Not under pressure, it's the full query shape. Cached separately.
+    with patch.object(
+        mock_elasticsearch, "search", wraps=mock_elasticsearch.search
+    ) as search:
+        response = user_client.get(url, {"q": "foo bar"})
+    assert response.json()["metadata"]["degradation_level"] == 0
+    assert "max-age=43200" in response["Cache-Control"]
+    body = search.call_args.kwargs["body"]
+    assert "suggest" in body
+    assert "highlight" in body
+    assert "match_phrase" in str(body["query"])
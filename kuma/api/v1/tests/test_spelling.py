@@ -0,0 +1,122 @@
+import pytest
+from django.core.cache import cache
+from elasticsearch_dsl.connections import connections
+
+from kuma.api.v1.search import spelling
+from kuma.api.v1.search.caching import get_index_generation
+
+from .test_search import FindEverythingFakeElasticsearch, wait_for_dictionaries
+
+
+class ScrollingFakeElasticsearch(FindEverythingFakeElasticsearch):
+    def clear_scroll(self, *args, **kwargs):
+        # ElasticMock can scroll, but doesn't know how to stop.
+        return {"succeeded": True}
+
+
+@pytest.fixture
+def dictionary():
+    return spelling.SpellingDictionary(
+        {"flexbox": 120, "flex": 300, "fetch": 200, "grid": 150, "grip": 2}
+    )
+
+
+@pytest.mark.parametrize(
+    "word, expected",
+    [
+        ("flexbox", None),
+        ("flexbx", "flexbox"),
+        ("flxebox", "flexbox"),
+        ("fetsh", "fetch"),
+        # Both are one substitution away, but "grid" is the more common.
+        ("grix", "grid"),
+        ("zzzzzz", None),
+        # Too short to tell.
+        ("gri", None),
+        # Only words that start with the same letter.
+        ("rgid", None),
+    ],
+)
+def test_correct(dictionary, word, expected):
+    assert dictionary.correct(word) == expected
+
+
+def test_suggest(dictionary):
+    assert dictionary.suggest("flexbx grid") == ("flexbox grid", 150)
+    assert dictionary.suggest("css flexbx") == ("css flexbox", 120)
+    assert dictionary.suggest("flexbox grid") is None
+    # Numbers, and anything not made of letters, are left alone.
+    assert dictionary.suggest("h1 flexbx") == ("h1 flexbox", 120)
+
+
+def test_suggest_leaves_short_words_alone():
+    # None of these are in the dictionary, but they're only an edit or two
+    # away from words that are.
+    dictionary = spelling.SpellingDictionary({"as": 900, "is": 800, "dom": 300})
+    assert dictionary.suggest("js") is None
+    assert dictionary.suggest("dom api") is None
+    assert dictionary.suggest("wasm") is None
+
+
+def test_count_words(settings):
+    settings.SEARCH_SPELLING_MIN_BODY_FREQUENCY = 2
+    documents = [
+        {"locale": "en-us", "title": "Flexbox", "body": "Flexbox layout rare"},
+        {"locale": "en-us", "title": "Grid", "body": "Grid layout"},
+        {"locale": "fr", "title": "Grille", "body": None},
+    ]
+    assert spelling.count_words(documents) == {
+        "en-us": {"flexbox": 1, "grid": 1, "layout": 2},
+        "fr": {"grille": 1},
+    }
+
+
+def test_build_dictionaries(settings):
+    fake_elasticsearch = ScrollingFakeElasticsearch()
+    for i, (locale, title) in enumerate([("en-us", "Flexbox"), ("fr", "Grille")]):
+        fake_elasticsearch.index(
+            settings.SEARCH_INDEX_NAME,
+            {"title": title, "body": "", "locale": locale},
+            id=str(i),
+        )
+    connections.add_connection("default", fake_elasticsearch)
+    spelling.reset()
+    try:
+        assert spelling.build_dictionaries() == ["en-us", "fr"]
+        # Only once per index generation, unless forced.
+        assert spelling.build_dictionaries() == []
+        assert spelling.build_dictionaries(force=True) == ["en-us", "fr"]
+
+        generation = get_index_generation()
+        assert cache.get(spelling._make_key(generation, "fr")) == {"grille": 1}
+        # It's loaded in the background.
+        assert spelling.get_dictionary(["en-us"], generation) is None
+        wait_for_dictionaries()
+        dictionary = spelling.get_dictionary(["en-us"], generation)
+        assert dictionary.correct("flexbx") == "flexbox"
+        # Only for searches in exactly one locale.
+        assert spelling.get_dictionary(["en-us", "fr"], generation) is None
+        settings.SEARCH_SPELLING_DICTIONARIES = False
+        assert spelling.get_dictionary(["en-us"], generation) is None
+    finally:
+        spelling.reset()
+        connections.remove_connection("default")
+
+
+def test_dictionaries_of_new_index_generation():
+    cache.set(spelling._make_key("mdn_docs_1", "en-us"), {"flexbox": 1})
+    cache.set(spelling._make_key("mdn_docs_2", "en-us"), {"grid": 1})
+    spelling.reset()
+    try:
+        spelling.get_dictionary(["en-us"], "mdn_docs_1")
+        wait_for_dictionaries()
+        assert spelling.get_dictionary(["en-us"], "mdn_docs_1").correct("flexbx")
+
+        # Yari swapped the index. The old dictionary is let go of right away.
+        assert spelling.get_dictionary(["en-us"], "mdn_docs_2") is None
+        assert spelling._make_key("mdn_docs_1", "en-us") not in spelling._loaded
+        wait_for_dictionaries()
+        assert spelling.get_dictionary(["en-us"], "mdn_docs_2").correct("gridd")
+        assert list(spelling._loaded) == [spelling._make_key("mdn_docs_2", "en-us")]
+    finally:
+        spelling.reset()
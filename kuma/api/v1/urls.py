@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from . import search
@@ -5,8 +6,13 @@ from .api import api
 from .plus.bookmarks import router as bookmarks_router
 from .plus.landing_page import router as landing_page_router
 from .plus.notifications import notifications_router, watch_router
+from .search import async_search
 from .views import settings_router
 
+# Both views behave the same, but the async one needs Kuma to be served
+# over ASGI to make any difference.
+search_view = async_search.search if settings.SEARCH_ASYNC else search.search
+
 api.add_router("/settings", settings_router)
 api.add_router("/plus/notifications/", notifications_router)
 api.add_router("/plus/", watch_router)
@@ -15,6 +21,11 @@ api.add_router("/plus/landing-page/", landing_page_router)
 
 urlpatterns = [
     path("", api.urls),
-    path("search/<locale>", search.search, name="api.v1.search_legacy"),
-    path("search", search.search, name="api.v1.search"),
+    path(
+        "search/autocomplete",
+        search.autocomplete,
+        name="api.v1.search_autocomplete",
+    ),
+    path("search/<locale>", search_view, name="api.v1.search_legacy"),
+    path("search", search_view, name="api.v1.search"),
 ]
@@ -20,12 +20,22 @@ class CoreConfig(AppConfig):
         self.add_periodc_tasks()
 
     def add_periodc_tasks(self):
-        from kuma.core.tasks import clean_sessions, clear_old_notifications
+        from kuma.api.tasks import build_spelling_dictionaries
+        from kuma.core.tasks import (
+            clean_sessions,
+            clear_old_notifications,
+            clear_old_processed_changes,
+        )
 
         # Clean up expired sessions every 60 minutes
         app.add_periodic_task(60 * 60, clean_sessions.s())
         # Delete old notifications every month
         app.add_periodic_task(60 * 60 * 24 * 30, clear_old_notifications.s())
+        # Delete the records of old processed changes every day
+        app.add_periodic_task(60 * 60 * 24, clear_old_processed_changes.s())
+        # Build the spelling dictionaries for search, once the index has been
+        # swapped for a new one, within 10 minutes
+        app.add_periodic_task(60 * 10, build_spelling_dictionaries.s())
 
     @cached_property
     def language_mapping(self):
@@ -1,9 +1,11 @@
 from datetime import datetime, timedelta
 
 from celery.task import task
+from django.conf import settings
 from django.contrib.sessions.models import Session
+from django.utils import timezone
 
-from ..notifications.models import Notification, NotificationData
+from ..notifications.models import Notification, NotificationData, ProcessedChange
 from .decorators import skip_in_maintenance_mode
 
 LOCK_ID = "clean-sessions-lock"
@@ -71,3 +73,17 @@ def clear_old_notifications():
         created__lt=datetime.now() - timedelta(days=6 * 30)
     ).delete()
     Notification.objects.filter(deleted=True).delete()
+
+
+@task
+@skip_in_maintenance_mode
+def clear_old_processed_changes():
+    """
+    Forget about the changes file events processed more than
+    NOTIFICATIONS_PROCESSED_CHANGES_DAYS ago. Should one of them come along
+    again, it's published again.
+    """
+    ProcessedChange.objects.filter(
+        created__lt=timezone.now()
+        - timedelta(days=settings.NOTIFICATIONS_PROCESSED_CHANGES_DAYS)
+    ).delete()
@@ -122,11 +122,34 @@ def test_status(client, settings, mock_status_externals):
         "available": True,
         "populated": True,
     }
+    timings = data["services"]["search"].pop("timings")
+    assert timings["total"] == {
+        "count": 0,
+        "sum_ms": 0,
+        "buckets": dict.fromkeys(
+            ["1", "2", "5", "10", "25", "50", "100", "250", "500", "1000"]
+            + ["2500", "5000", "+Inf"],
+            0,
+        ),
+    }
     assert data["services"]["search"] == {
         "available": True,
         "populated": True,
         "count": 90,
         "health": {"status": "pink"},
+        "metrics": {
+            "cache.hit": 0,
+            "cache.miss": 0,
+            "coalesce.wait": 0,
+            "coalesce.timeout": 0,
+            "breaker.opened": 0,
+            "breaker.rejected": 0,
+            "hedge.eligible": 0,
+            "hedge.sent": 0,
+            "hedge.won": 0,
+            "hedge.saturated": 0,
+            "querylog.dropped": 0,
+        },
     }
     assert data["services"]["test_accounts"] == {
         "available": True,
@@ -10,6 +10,8 @@ from elasticsearch.exceptions import NotFoundError, TransportError
 from elasticsearch_dsl import Search
 from elasticsearch_dsl.connections import connections as es_connections
 
+from kuma.api.v1.search import metrics as search_metrics
+
 
 @never_cache
 @require_safe
@@ -96,7 +98,14 @@ def status(request):
     data["services"]["database"] = doc_data
 
     # Check that Elasticsearch is reachable and somewhat healthy
-    search_data = {"available": None, "populated": None, "health": None, "count": None}
+    search_data = {
+        "available": None,
+        "populated": None,
+        "health": None,
+        "count": None,
+        "metrics": search_metrics.snapshot(),
+        "timings": search_metrics.timings(),
+    }
     try:
         es_connections.create_connection(hosts=settings.ES_URLS)
         connection = es_connections.get_connection()
@@ -1,8 +1,11 @@
-import json
+from functools import partial
 
 from django.core.management.base import BaseCommand
 
-from kuma.notifications.utils import process_changes
+from kuma.notifications.utils import process_changes_stream
+
+# How many characters of the file are read at a time.
+READ_SIZE = 64 * 1024
 
 
 class Command(BaseCommand):
@@ -12,5 +15,4 @@ class Command(BaseCommand):
         parser.add_argument("file", type=open)
 
     def handle(self, *args, **options):
-        changes = json.loads(options["file"].read())
-        process_changes(changes)
+        process_changes_stream(iter(partial(options["file"].read, READ_SIZE), ""))
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.12 on 2026-10-18 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0012_changesingestjob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="changesingestjob",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("downloading", "Downloading"),
+                    ("running", "Running"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                max_length=16,
+            ),
+        ),
+    ]
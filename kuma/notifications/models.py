@@ -92,3 +92,49 @@ class UserWatch(CustomBaseModel):
 
 class DefaultWatch(CustomBaseModel):
     user = models.OneToOneField(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+
+
+class ChangesIngestJob(models.Model):
+    """A changes file, being turned into notifications by Celery, chunk by
+    chunk. See `kuma.notifications.tasks.ingest_changes`."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        DOWNLOADING = "downloading"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    filename = models.CharField(max_length=256)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    # How many events there are in the file, and in how many chunks they are
+    # being processed.
+    events = models.PositiveIntegerField(default=0)
+    # The SHA-256 of the file, once it has been downloaded.
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    chunks = models.PositiveIntegerField(default=0)
+    chunks_done = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list)
+    created = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.status})"
+
+
+class ProcessedChange(models.Model):
+    """An event, of a changes file, that notifications have been published
+    for. So that, when the same event comes along again, in a re-submitted
+    or an overlapping changes file, they aren't published all over again.
+    See `kuma.notifications.utils.process_changes`. They're only remembered
+    for `settings.NOTIFICATIONS_PROCESSED_CHANGES_DAYS`, see
+    `kuma.core.tasks.clear_old_processed_changes`."""
+
+    # The SHA-256 of the event, see `kuma.notifications.utils.change_key`.
+    key = models.CharField(max_length=64, unique=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,114 @@
+import hashlib
+import json
+
+import requests
+from celery import task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from sentry_sdk import capture_exception
+
+from kuma.notifications.models import ChangesIngestJob
+from kuma.notifications.utils import iter_batches, iter_json_array, process_changes
+
+# How many seconds to wait for the changes file to start (or continue) to
+# download.
+DOWNLOAD_TIMEOUT = 60
+
+# How many bytes of the changes file are read at a time.
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+@task
+def ingest_changes(job_id):
+    """Read the changes file of the job, as it downloads, and hand its events,
+    a chunk at a time, to be processed in parallel.
+
+    A file that was ingested before isn't skipped as a whole, since its hash
+    is only known once it's been read in full. Its events are skipped one by
+    one instead, by `process_changes`."""
+    job = ChangesIngestJob.objects.get(id=job_id)
+    job.status = ChangesIngestJob.Status.DOWNLOADING
+    job.save(update_fields=["status", "modified"])
+    events = 0
+    digest = hashlib.sha256()
+    error = None
+    try:
+        with requests.get(
+            settings.NOTIFICATIONS_CHANGES_URL + job.filename,
+            timeout=DOWNLOAD_TIMEOUT,
+            stream=True,
+        ) as response:
+            changes = iter_json_array(
+                _hashed(response.iter_content(DOWNLOAD_CHUNK_SIZE), digest)
+            )
+            for index, chunk in enumerate(
+                iter_batches(changes, settings.NOTIFICATIONS_INGEST_CHUNK_SIZE)
+            ):
+                events += len(chunk)
+                ChangesIngestJob.objects.filter(id=job_id).update(
+                    chunks=F("chunks") + 1, modified=timezone.now()
+                )
+                process_changes_chunk.delay(job_id, index, chunk)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        # The file isn't valid JSON (or UTF-8), or it was cut short.
+        capture_exception(e)
+        error = f"Error while reading file: {repr(e)}"
+    except Exception as e:
+        capture_exception(e)
+        error = f"Error while downloading file: {repr(e)}"
+
+    with transaction.atomic():
+        job = ChangesIngestJob.objects.select_for_update().get(id=job_id)
+        job.events = events
+        if error:
+            job.errors.append(error)
+        else:
+            job.content_hash = digest.hexdigest()
+        # Unless it took so long that it was given up on (see
+        # `kuma.api.v1.plus.notifications.update`), in which case it stays so.
+        if job.status == ChangesIngestJob.Status.DOWNLOADING:
+            job.status = ChangesIngestJob.Status.RUNNING
+            # The chunks might all be done already.
+            _finish_if_done(job)
+        job.save()
+
+
+def _hashed(chunks, digest):
+    """Yield the `chunks` as they are, after adding each of them to the
+    `digest`."""
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+@task
+def process_changes_chunk(job_id, index, changes):
+    error = None
+    try:
+        process_changes(changes)
+    except Exception as e:
+        capture_exception(e)
+        error = f"Error while processing chunk {index}: {repr(e)}"
+
+    # The chunks finish in any order, and maybe at the same time.
+    with transaction.atomic():
+        job = ChangesIngestJob.objects.select_for_update().get(id=job_id)
+        job.chunks_done += 1
+        if error:
+            job.errors.append(error)
+        _finish_if_done(job)
+        job.save()
+
+
+def _finish_if_done(job):
+    # Until the whole file has been read, there might be more chunks to come.
+    if job.status == ChangesIngestJob.Status.RUNNING and (
+        job.chunks_done >= job.chunks
+    ):
+        job.status = (
+            ChangesIngestJob.Status.FAILED
+            if job.errors
+            else ChangesIngestJob.Status.DONE
+        )
@@ -0,0 +1,128 @@
+import datetime
+import json
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from model_bakery import baker
+
+from kuma.core.tasks import clear_old_processed_changes
+from kuma.notifications import models
+from kuma.notifications.utils import (
+    change_key,
+    iter_batches,
+    iter_json_array,
+    process_changes,
+)
+
+CHANGES = [
+    {"event": "added_subfeatures", "path": "api.Foo", "subfeatures": ["x"]},
+    -1.5e3,
+    12345,
+    "Ünïcode ✓",
+    [True, False, None],
+    {},
+]
+
+
+@pytest.mark.parametrize("encode", [False, True])
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_iter_json_array(encode, size):
+    text = json.dumps(CHANGES, indent=2, ensure_ascii=False)
+    if encode:
+        text = text.encode("utf-8")
+    chunks = [text[i : i + size] for i in range(0, len(text), size)]
+    assert list(iter_json_array(chunks)) == CHANGES
+
+
+def test_iter_json_array_yields_as_it_goes():
+    def chunks():
+        yield '[{"a": 1}, '
+        # The first element is out before the rest has been read.
+        assert elements == [{"a": 1}]
+        yield '{"b": 2}]'
+
+    elements = []
+    for element in iter_json_array(chunks()):
+        elements.append(element)
+    assert elements == [{"a": 1}, {"b": 2}]
+
+
+@pytest.mark.parametrize(
+    "text", ["", "{}", "[", "[1", "[1,", "[1,]", "[,1]", "[1 2]", "[1]]", "[{]"]
+)
+def test_iter_json_array_invalid(text):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array([text]))
+
+
+def test_iter_batches():
+    assert list(iter_batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(iter_batches([], 2)) == []
+
+
+def test_extract_notifications(wiki_user, tmp_path):
+    baker.make(models.Watch, users=[wiki_user], path="api.Foo", url="/foo")
+    changes = [
+        {"event": "added_subfeatures", "path": f"api.Foo.{i}", "subfeatures": ["x"]}
+        for i in range(3)
+    ]
+    path = tmp_path / "changes.json"
+    path.write_text(json.dumps(changes))
+    call_command("extract_notifications", str(path))
+    assert models.Notification.objects.count() == 3
+
+
+def test_process_changes_idempotent(wiki_user):
+    baker.make(models.Watch, users=[wiki_user], path="api.Foo", url="/foo")
+    changes = [
+        {"event": "added_subfeatures", "path": f"api.Foo.{i}", "subfeatures": ["x"]}
+        for i in range(2)
+    ]
+    process_changes(changes)
+    assert models.Notification.objects.count() == 2
+    assert models.ProcessedChange.objects.count() == 2
+
+    # The same again, and within the same batch, is only published once.
+    process_changes(changes + [dict(changes[0])])
+    assert models.Notification.objects.count() == 2
+
+    # Unless it failed, in which case none of the batch counts as processed.
+    new_change = {"event": "added_subfeatures", "path": "api.Foo.new"}
+    with pytest.raises(KeyError):
+        process_changes([{**new_change, "subfeatures": ["x"]}, new_change])
+    assert models.ProcessedChange.objects.count() == 2
+    process_changes([{**new_change, "subfeatures": ["x"]}])
+    assert models.Notification.objects.count() == 3
+
+
+def test_process_changes_claims_in_batches(wiki_user):
+    baker.make(models.Watch, users=[wiki_user], path="api.Foo", url="/foo")
+    changes = [
+        {"event": "added_subfeatures", "path": f"api.Foo.{i}", "subfeatures": ["x"]}
+        for i in range(3)
+    ]
+    # One that another process has already claimed.
+    models.ProcessedChange.objects.create(key=change_key(changes[1]))
+    with patch("kuma.notifications.utils.CLAIM_BATCH_SIZE", 2):
+        process_changes(changes)
+    notified = models.Notification.objects.order_by("notification__title")
+    assert [x.notification.title for x in notified] == ["Foo.0", "Foo.2"]
+    for processed in models.ProcessedChange.objects.all():
+        assert processed.created <= timezone.now()
+    process_changes([])
+
+
+def test_clear_old_processed_changes(db, settings):
+    settings.NOTIFICATIONS_PROCESSED_CHANGES_DAYS = 90
+    models.ProcessedChange.objects.bulk_create(
+        [models.ProcessedChange(key="old"), models.ProcessedChange(key="recent")]
+    )
+    models.ProcessedChange.objects.filter(key="old").update(
+        created=timezone.now() - datetime.timedelta(days=91)
+    )
+    clear_old_processed_changes()
+    assert list(models.ProcessedChange.objects.values_list("key", flat=True)) == [
+        "recent"
+    ]
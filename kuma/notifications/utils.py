@@ -1,18 +1,83 @@
+import codecs
+import hashlib
+import json
 import re
 from collections import defaultdict
 
+from django.db import connection, transaction
+from django.utils import timezone
+
 from kuma.documenturls.models import DocumentURL
 from kuma.notifications.browsers import browsers
-from kuma.notifications.models import Notification, NotificationData, Watch
+from kuma.notifications.models import (
+    Notification,
+    NotificationData,
+    ProcessedChange,
+    UserWatch,
+    Watch,
+)
+
+# How many events, of a changes file, are processed at a time, when reading it
+# as a stream.
+CHANGES_BATCH_SIZE = 200
+
+# How many events are recorded as processed per INSERT. Keeps the number of
+# query parameters well under what any database allows.
+CLAIM_BATCH_SIZE = 500
+
+# The whitespace allowed in between the elements of a JSON array.
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# What might be more of a number, e.g. "-1" might be the start of "-1.5e3".
+JSON_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+# How many notifications are inserted per statement, when notifying all the
+# users watching a page.
+NOTIFY_BATCH_SIZE = 1000
+
+
+def notify_watchers(notification_data, watchers):
+    """Create the notification for every user watching any of the `watchers`,
+    in one INSERT per `NOTIFY_BATCH_SIZE` users, rather than one per user."""
+    user_ids = UserWatch.objects.filter(watch__in=watchers).values_list(
+        "user_id", flat=True
+    )
+    Notification.objects.bulk_create(
+        [
+            Notification(notification=notification_data, user_id=user_id)
+            for user_id in user_ids.iterator()
+        ],
+        batch_size=NOTIFY_BATCH_SIZE,
+    )
 
 
-def publish_bcd_notification(path, text, data=None):
+def get_watchers_by_path(paths):
+    """Return the watch of each of the paths, that is watched, in one query.
+    If there's more than one watch of a path, the first one."""
+    watchers = {}
+    for watch in Watch.objects.filter(path__in=set(paths)).order_by("pk"):
+        watchers.setdefault(watch.path, watch)
+    return watchers
+
+
+def get_path_prefixes(path):
+    """Return the path and every path it's under, e.g. 'api.Foo.bar' and then
+    'api.Foo' and 'api'."""
+    parts = path.split(".")
+    return [".".join(parts[:i]) for i in range(len(parts), 0, -1)]
+
+
+def publish_bcd_notification(path, text, data=None, watchers=None):
+    # The watchers of every prefix of the path, unless they have already been
+    # looked up (see `process_changes`).
+    if watchers is None:
+        watchers = get_watchers_by_path(get_path_prefixes(path))
+
     # This traverses down the path to see if there's top level watchers
     parts = path.split(".")
     suffix = []
     while len(parts) > 0:
         subpath = ".".join(parts)
-        watcher = Watch.objects.filter(path=subpath).first()
+        watcher = watchers.get(subpath)
         suffix.append(parts.pop())
 
         if not watcher:
@@ -31,8 +96,7 @@ def publish_bcd_notification(path, text, data=None):
             type="compat",
             page_url=watcher.url,
         )
-        for user in watcher.users.all():
-            Notification.objects.create(notification=notification_data, user=user)
+        notify_watchers(notification_data, [watcher])
 
 
 def get_browser_info(browser, preview=False):
@@ -87,13 +151,64 @@ def publish_content_notification(url, text):
         text=text, title=watchers[0].title, type="content", page_url=url
     )
 
-    for watcher in watchers:
-        # considering the possibility of multiple pages existing for the same path
-        for user in watcher.users.all():
-            Notification.objects.create(notification=notification_data, user=user)
+    # considering the possibility of multiple pages existing for the same path
+    notify_watchers(notification_data, watchers)
+
+
+def change_key(change):
+    """Return the idempotency key of the event: the same for the same event,
+    in whichever changes file it comes along."""
+    return hashlib.sha256(
+        json.dumps(change, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
 
 
 def process_changes(changes):
+    # Either all the notifications for these changes are published, and the
+    # changes are recorded as processed, or none at all. Changes that were
+    # already processed, or are being processed right now, are skipped.
+    with transaction.atomic():
+        keys = {}
+        for change in changes:
+            keys.setdefault(change_key(change), change)
+        claimed = _claim_changes(keys)
+        _publish_changes([change for key, change in keys.items() if key in claimed])
+
+
+def _claim_changes(keys):
+    """Record the keys as processed, and return the ones that weren't yet.
+
+    Inserting a key that another transaction has inserted, but not committed
+    yet, waits until that transaction is over. So every key is claimed by
+    exactly one transaction, and stays claimed only if that one commits.
+    Checking which keys exist, before inserting them, would let concurrent
+    transactions both see a key as new, and both publish its notifications.
+
+    The keys are inserted in order, so that two transactions with keys in
+    common always wait on them in the same order, rather than on each other.
+    """
+    table = connection.ops.quote_name(ProcessedChange._meta.db_table)
+    key_column = connection.ops.quote_name(
+        ProcessedChange._meta.get_field("key").column
+    )
+    created_column = connection.ops.quote_name(
+        ProcessedChange._meta.get_field("created").column
+    )
+    created = connection.ops.adapt_datetimefield_value(timezone.now())
+    claimed = set()
+    with connection.cursor() as cursor:
+        for batch in iter_batches(sorted(keys), CLAIM_BATCH_SIZE):
+            cursor.execute(
+                f"INSERT INTO {table} ({key_column}, {created_column}) "
+                f"VALUES {', '.join(['(%s, %s)'] * len(batch))} "
+                f"ON CONFLICT ({key_column}) DO NOTHING RETURNING {key_column}",
+                [value for key in batch for value in (key, created)],
+            )
+            claimed.update(key for (key,) in cursor.fetchall())
+    return claimed
+
+
+def _publish_changes(changes):
     bcd_notifications = []
     content_notifications = []
 
@@ -153,8 +268,101 @@ def process_changes(changes):
                 }
             )
 
-    for notification in bcd_notifications:
-        publish_bcd_notification(**notification)
+    if bcd_notifications:
+        # Look up who's watching any of the paths, or what they're under, all
+        # at once, rather than level by level for every single change.
+        watchers = get_watchers_by_path(
+            prefix
+            for notification in bcd_notifications
+            for prefix in get_path_prefixes(notification["path"])
+        )
+        for notification in bcd_notifications:
+            publish_bcd_notification(**notification, watchers=watchers)
 
     for notification in content_notifications:
         publish_content_notification(**notification)
+
+
+def iter_json_array(chunks):
+    """Yield the elements of the JSON array that the `chunks` (of text, or
+    UTF-8 bytes) make up, one by one, as soon as each of them is complete.
+
+    Only the element being read is ever held in memory, not the whole array.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    # What's expected next: the "[", the first element (or "]"), a "," (or
+    # "]"), an element after a ",", or nothing at all after the "]".
+    state = "start"
+    for chunk, final in _chunks_then_end(chunks):
+        if isinstance(chunk, bytes):
+            chunk = utf8.decode(chunk, final)
+        buffer += chunk
+        pos = 0
+        while True:
+            pos = JSON_WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+            if state == "start":
+                if char != "[":
+                    raise json.JSONDecodeError("Expecting '['", buffer, pos)
+                state = "first"
+                pos += 1
+            elif state == "end":
+                raise json.JSONDecodeError("Extra data", buffer, pos)
+            elif char == "]" and state in ("first", "comma"):
+                state = "end"
+                pos += 1
+            elif state == "comma":
+                if char != ",":
+                    raise json.JSONDecodeError("Expecting ','", buffer, pos)
+                state = "element"
+                pos += 1
+            else:
+                try:
+                    element, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    # It's not all there yet.
+                    break
+                if (
+                    not final
+                    and type(element) in (int, float)
+                    and JSON_NUMBER_TAIL.match(buffer, end).end() == len(buffer)
+                ):
+                    # Maybe there's more to this number in the next chunk.
+                    break
+                yield element
+                pos = end
+                state = "comma"
+        buffer = buffer[pos:]
+    if state != "end":
+        raise json.JSONDecodeError("Unterminated array", buffer, len(buffer))
+
+
+def _chunks_then_end(chunks):
+    for chunk in chunks:
+        yield chunk, False
+    yield "", True
+
+
+def iter_batches(iterable, size):
+    """Yield lists of (at most) `size` of the items, one list at a time."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def process_changes_stream(chunks, batch_size=CHANGES_BATCH_SIZE):
+    """Same as `process_changes`, but for the changes file read in chunks,
+    so that only `batch_size` changes are held in memory at a time."""
+    for batch in iter_batches(iter_json_array(chunks), batch_size):
+        process_changes(batch)
@@ -271,6 +271,22 @@ NOTIFICATIONS_CHANGES_URL = config(
     "NOTIFICATIONS_CHANGES_URL",
     default="https://updates.developer.allizom.org/notifications/",
 )
+# How many of the events, of a changes file, each Celery task processes.
+NOTIFICATIONS_INGEST_CHUNK_SIZE = config(
+    "NOTIFICATIONS_INGEST_CHUNK_SIZE", default=200, cast=int
+)
+# After how many seconds without any progress a changes file's job is given
+# up on (for example, because its Celery worker was killed), so that the
+# file can be submitted again.
+NOTIFICATIONS_INGEST_STALE_AFTER = config(
+    "NOTIFICATIONS_INGEST_STALE_AFTER", default=60 * 60, cast=int
+)
+# For how many days the events of changes files are remembered as processed
+# (see kuma.notifications.models.ProcessedChange). The same event, submitted
+# again after that, is published again.
+NOTIFICATIONS_PROCESSED_CHANGES_DAYS = config(
+    "NOTIFICATIONS_PROCESSED_CHANGES_DAYS", default=90, cast=int
+)
 
 TEMPLATES = [
     {
@@ -488,6 +504,58 @@ ES_Q_MAXLENGTH = config("ES_Q_MAXLENGTH", default=200, cast=int)
 ES_RETRY_SLEEPTIME = config("ES_RETRY_SLEEPTIME", default=1, cast=int)
 ES_RETRY_ATTEMPTS = config("ES_RETRY_ATTEMPTS", default=5, cast=int)
 ES_RETRY_JITTER = config("ES_RETRY_JITTER", default=1, cast=int)
+# No matter how many attempts are left, give up retrying a search after
+# this many seconds in total.
+ES_RETRY_DEADLINE = config("ES_RETRY_DEADLINE", default=5, cast=float)
+# Redirect searches to their canonical URL (normalized query string, sorted
+# parameters, without defaults), so the CDN caches fewer copies of the same.
+SEARCH_CANONICAL_REDIRECTS = config(
+    "SEARCH_CANONICAL_REDIRECTS", default=True, cast=bool
+)
+# The name of a field, in the search index, with the slug tokenized with the
+# `path_hierarchy` tokenizer. If there is one, the `slug_prefix` filter is a
+# term lookup on it. Otherwise, it's a prefix query on the `slug`. Note that,
+# with the field, `web/css` only matches `web/css` and what's under it, not
+# `web/cssom`.
+SEARCH_SLUG_HIERARCHY_FIELD = config("SEARCH_SLUG_HIERARCHY_FIELD", default="")
+# When searches take longer than these many milliseconds (on a moving
+# average), leave out the suggestions, then the match-phrase queries too, and
+# then the highlighting too. See kuma.api.v1.search.load. Empty to disable.
+SEARCH_DEGRADATION_THRESHOLDS = config(
+    "SEARCH_DEGRADATION_THRESHOLDS", default="500,1000,2000", cast=Csv(int)
+)
+# Render the search request bodies from precompiled templates, rather than
+# building them with elasticsearch_dsl, for every search.
+SEARCH_COMPILED_QUERIES = config("SEARCH_COMPILED_QUERIES", default=True, cast=bool)
+# Make the "Did you mean...?" suggestions with the spelling dictionaries,
+# built by the build_spelling_dictionaries command (or periodic Celery task),
+# for the current index, rather than with Elasticsearch's term suggesters.
+SEARCH_SPELLING_DICTIONARIES = config(
+    "SEARCH_SPELLING_DICTIONARIES", default=True, cast=bool
+)
+# At most this many of the most common words go in each locale's dictionary.
+SEARCH_SPELLING_MAX_WORDS = config("SEARCH_SPELLING_MAX_WORDS", default=20000, cast=int)
+# Words only in the bodies, not in any title, have to be in at least this
+# many documents to go in the dictionary.
+SEARCH_SPELLING_MIN_BODY_FREQUENCY = config(
+    "SEARCH_SPELLING_MIN_BODY_FREQUENCY", default=3, cast=int
+)
+# Serve /api/v1/search with the async view, which talks to Elasticsearch
+# with AsyncElasticsearch. Only makes sense when served over ASGI.
+SEARCH_ASYNC = config("SEARCH_ASYNC", default=False, cast=bool)
+# After this many searches have failed, within the window (in seconds),
+# Elasticsearch is considered unavailable and searches fail fast, with a
+# 503, for the next SEARCH_BREAKER_RESET_TIMEOUT seconds. After that, one
+# search is let through to see if Elasticsearch has recovered.
+SEARCH_BREAKER_FAILURE_THRESHOLD = config(
+    "SEARCH_BREAKER_FAILURE_THRESHOLD", default=10, cast=int
+)
+SEARCH_BREAKER_FAILURE_WINDOW = config(
+    "SEARCH_BREAKER_FAILURE_WINDOW", default=30, cast=int
+)
+SEARCH_BREAKER_RESET_TIMEOUT = config(
+    "SEARCH_BREAKER_RESET_TIMEOUT", default=30, cast=int
+)
 
 # Logging is merged with the default logging
 # https://github.com/django/django/blob/stable/1.11.x/django/utils/log.py
@@ -559,6 +627,83 @@ ATTACHMENTS_AWS_S3_ENDPOINT_URL = config(
 # Kuma doesn't index anything, that's done by the Yari Deployer, but we need
 # to know what the index is called for searching.
 SEARCH_INDEX_NAME = config("SEARCH_INDEX_NAME", default="mdn_docs")
+# The field that /api/v1/search/autocomplete matches prefixes against. It's
+# fastest if Yari maps it as a `search_as_you_type` field.
+SEARCH_AUTOCOMPLETE_FIELD = config("SEARCH_AUTOCOMPLETE_FIELD", default="title")
+# For how many seconds the results of a search are cached, server-side, in
+# the default cache. Set to 0 to disable caching of search results.
+SEARCH_RESULTS_CACHE_TIMEOUT = config(
+    "SEARCH_RESULTS_CACHE_TIMEOUT", default=60 * 5, cast=int
+)
+# Count the documents found exactly up to this many, and report any more
+# than that as "at least" that many. Set to 0 to leave it to Elasticsearch.
+SEARCH_TRACK_TOTAL_HITS = config("SEARCH_TRACK_TOTAL_HITS", default=10000, cast=int)
+# How long each shard gets to search (an Elasticsearch time value, e.g.
+# "500ms") before returning what it found so far. Empty for no limit.
+SEARCH_SHARD_TIMEOUT = config("SEARCH_SHARD_TIMEOUT", default="2s")
+# Stop searching each shard after this many documents have been found.
+# Set to 0 for no limit.
+SEARCH_TERMINATE_AFTER = config("SEARCH_TERMINATE_AFTER", default=0, cast=int)
+# Hedge searches: when the Elasticsearch node a search was sent to hasn't
+# answered within this percentile of recent response times, send the same
+# search to another of the ES_URLS, and take whichever answer comes first.
+# Set to 0 to disable hedging.
+SEARCH_HEDGE_PERCENTILE = config("SEARCH_HEDGE_PERCENTILE", default=0, cast=int)
+# Never hedge a search sooner than this many milliseconds.
+SEARCH_HEDGE_MIN_DELAY = config("SEARCH_HEDGE_MIN_DELAY", default=50, cast=int)
+# How many searches, per process, can be in flight at once when hedging.
+# When they're all taken, searches are sent unhedged.
+SEARCH_HEDGE_MAX_WORKERS = config("SEARCH_HEDGE_MAX_WORKERS", default=16, cast=int)
+# The fraction (0 to 1) of searches that are logged, for analytics and cache
+# warming. See the search_query_log command. Set to 0 to log none.
+SEARCH_QUERY_LOG_SAMPLE_RATE = config(
+    "SEARCH_QUERY_LOG_SAMPLE_RATE", default=0.0, cast=float
+)
+# The JSON lines file the logged searches are appended to. If empty, they're
+# added to a Redis stream instead, capped at about
+# SEARCH_QUERY_LOG_STREAM_MAXLEN entries.
+SEARCH_QUERY_LOG_FILE = config("SEARCH_QUERY_LOG_FILE", default="")
+SEARCH_QUERY_LOG_STREAM_MAXLEN = config(
+    "SEARCH_QUERY_LOG_STREAM_MAXLEN", default=100000, cast=int
+)
+# How many logged searches each process holds on to, at most, in between
+# flushing them (every SEARCH_QUERY_LOG_FLUSH_INTERVAL seconds).
+SEARCH_QUERY_LOG_BUFFER_SIZE = config(
+    "SEARCH_QUERY_LOG_BUFFER_SIZE", default=10000, cast=int
+)
+SEARCH_QUERY_LOG_FLUSH_INTERVAL = config(
+    "SEARCH_QUERY_LOG_FLUSH_INTERVAL", default=10, cast=int
+)
+# For how many seconds to trust what we know about which concrete index
+# the SEARCH_INDEX_NAME alias points to. After a re-index, cached search
+# results become stale at most this many seconds later.
+SEARCH_INDEX_GENERATION_TIMEOUT = config(
+    "SEARCH_INDEX_GENERATION_TIMEOUT", default=60, cast=int
+)
+# How long (in seconds) to wait for Elasticsearch to tell which index that
+# is. If it can't, in time, the searches go ahead without knowing, and it's
+# not asked again for SEARCH_INDEX_GENERATION_FAILURE_TIMEOUT seconds.
+SEARCH_INDEX_GENERATION_REQUEST_TIMEOUT = config(
+    "SEARCH_INDEX_GENERATION_REQUEST_TIMEOUT", default=1.0, cast=float
+)
+SEARCH_INDEX_GENERATION_FAILURE_TIMEOUT = config(
+    "SEARCH_INDEX_GENERATION_FAILURE_TIMEOUT", default=5, cast=int
+)
+# When identical searches are requested at the same time, only the first one
+# is sent to Elasticsearch and the others wait for its results. This is how
+# long (in seconds) they wait, at most, before running the search themselves.
+# Set to 0 to disable this coalescing of searches.
+SEARCH_COALESCE_TIMEOUT = config("SEARCH_COALESCE_TIMEOUT", default=3, cast=int)
+# How often (in seconds) a waiting search checks for the results.
+SEARCH_COALESCE_POLL_INTERVAL = config(
+    "SEARCH_COALESCE_POLL_INTERVAL", default=0.05, cast=float
+)
+# How often (in seconds) each process adds its search metrics to the
+# shared counters, in the background. With 0, they're added right away, on
+# the request path, which is only meant for the tests.
+SEARCH_METRICS_FLUSH_INTERVAL = config(
+    "SEARCH_METRICS_FLUSH_INTERVAL", default=10, cast=int
+)
 
 # When someone wants to bookmark something we only allow the URI (pathname)
 # to be supplied. We control what the absolute URL becomes based on that.
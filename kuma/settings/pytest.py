@@ -14,6 +14,8 @@ ES_URLS = ["1.2.3.4:9200"]
 ES_RETRY_SLEEPTIME = 0
 ES_RETRY_ATTEMPTS = 1
 ES_RETRY_JITTER = 0
+# So that the tests can see the counters straight away.
+SEARCH_METRICS_FLUSH_INTERVAL = 0
 
 # SHA1 because it is fast, and hard-coded in the test fixture JSON.
 PASSWORD_HASHERS = ("django.contrib.auth.hashers.SHA1PasswordHasher",)